@@ -5,10 +5,17 @@
 集成PHP解析器和机器学习模型进行代码异味检测
 """
 
+import io
 import os
 import re
 import json
+import mmap
 import pickle
+import hashlib
+import functools
+from concurrent.futures import ProcessPoolExecutor
+from datetime import datetime
+import joblib
 import numpy as np
 from typing import Dict, List, Tuple, Optional, Any
 from dataclasses import dataclass
@@ -16,9 +23,351 @@ import warnings
 warnings.filterwarnings('ignore')
 
 from php_parser import PHPParser
-from feature_extractor import FeatureExtractor, CodeFeatures
+from feature_extractor import FeatureExtractor, CodeFeatures, N_FEATURES
 
-@dataclass
+try:
+    from numba import njit
+except ImportError:
+    # numba不可用时退化为纯Python实现（与PHP不可用时的备用解析思路一致）
+    def njit(*args, **kwargs):
+        def wrapper(func):
+            return func
+        return wrapper
+
+try:
+    # RE2线性时间引擎: .*密集的模式在对抗性长行上不会灾难性回溯，
+    # 仅用于纯字面量+.*的模式（RE2不支持反向引用等特性）
+    import re2 as re_fast
+except ImportError:
+    re_fast = re
+
+# 预编译的正则表达式（模块级常量，避免在逐行循环中重复查找/编译）
+_RE_FUNCTION = re.compile(r'function\s+([a-zA-Z_][a-zA-Z0-9_]*)\s*\(([^)]*)\)', re.IGNORECASE)
+_RE_FUNCTION_SHORT = re.compile(r'function\s+(\w+)\s*\(', re.IGNORECASE)
+_RE_FUNCTION_PARAMS = re.compile(r'function\s+(\w+)\s*\(([^)]*)\)', re.IGNORECASE)
+_RE_FUNCTION_NAME = re.compile(r'function\s+([a-zA-Z_][a-zA-Z0-9_]*)', re.IGNORECASE)
+_RE_CLASS = re.compile(r'class\s+(\w+)', re.IGNORECASE)
+_RE_CONTROL = re.compile(r'\b(if|for|foreach|while|switch)\b', re.IGNORECASE)
+_RE_METHOD_VIS = re.compile(r'(public|private|protected)\s+function\s+(\w+)', re.IGNORECASE)
+_RE_PASCAL_CASE = re.compile(r'^[A-Z][a-zA-Z0-9]*$')
+_RE_CAMEL_CASE = re.compile(r'^[a-z][a-zA-Z0-9]*$')
+_RE_UPPER_VAR = re.compile(r'\$([A-Z_][A-Z0-9_]*)')
+
+# 参数列表清理
+_RE_PARAM_TAIL = re.compile(r'\).*$')
+_RE_PARAM_PREFIX = re.compile(r'^\s*\$?')
+_RE_PARAM_DEFAULT = re.compile(r'\s*=.*$')
+
+# SQL注入检测（直接字符串拼接的SQL）
+# 四种拼接模式合并为一个alternation，一次扫描即可；
+# 配合廉价的关键字子串预过滤，绝大多数非SQL行根本不会触发正则
+_SQL_KEYWORDS = ('select', 'insert', 'update', 'delete')
+_RE_SQL_ANY = re.compile(
+    r'(SELECT|INSERT|UPDATE|DELETE).*'
+    r'(\$\w+'        # 直接变量拼接
+    r'|\.\s*\$'      # . $var拼接
+    r'|".*\$.*"'     # 双引号内变量拼接
+    r'|\'.*\$.*\')', # 单引号内变量拼接
+    re.IGNORECASE)
+_RE_SQL_SAFE = re.compile(r'(prepare|PDO::PARAM|bindParam|bindValue|\?)', re.IGNORECASE)
+
+# 安全问题检测
+_RE_SUPERGLOBAL = re.compile(r'\$_(GET|POST|REQUEST|COOKIE)\[')
+_RE_SANITIZER = re.compile(r'(filter_|htmlspecialchars|strip_tags|mysqli_real_escape_string)')
+_RE_PLAIN_PASSWORD = re_fast.compile(r'\$.*password.*=.*\$.*password', re_fast.IGNORECASE)
+_RE_PASSWORD_HASH = re.compile(r'(password_hash|hash|crypt|bcrypt)', re.IGNORECASE)
+_RE_HARDCODED_PDO = re_fast.compile(r'new\s+PDO\(.*localhost.*root.*[\'"][0-9]+[\'"]')
+# 三条安全规则合并为单一alternation: 整个文件一趟finditer标出候选行，
+# 未命中的行（绝大多数）完全跳过安全检查，命中行再走精确的逐条规则
+_RE_SECURITY_ANY = re.compile(
+    r'\$_(?:GET|POST|REQUEST|COOKIE)\['
+    r'|(?i:\$.*password.*=.*\$.*password)'
+    r'|new\s+PDO\(.*localhost.*root.*[\'"][0-9]+[\'"]')
+_RE_DB_CALL = re.compile(r'(->query\(|->exec\(|mail\()')
+_RE_ERROR_HANDLING = re.compile(r'(try|catch|if.*false|error)', re.IGNORECASE)
+
+# 代码质量检测
+_RE_COMMENT_MARK = re.compile(r'(/\*|\*|//)')
+_RE_TYPE_HINT = re.compile(r'(int|string|bool|array|object|\w+\s+\$)')
+_RE_ACCESS_MODIFIER = re.compile(r'(public|private|protected)')
+
+# 质量规则的整文件批量探测（对'\n'.join(stripped_lines)做MULTILINE扫描）。
+# 与逐行版本逐条等价: \s换成[^\S\n]、[^)]换成[^)\n]，保证匹配不会跨行，
+# 其余字符类(\w、\$、字面量)本身匹配不到换行
+_QUALITY_PROBES = (
+    re.compile(r'^class[^\S\n]+\w+', re.MULTILINE),                              # 缺少类注释
+    re.compile(r'public[^\S\n]+\$\w+', re.MULTILINE),                            # public属性
+    re.compile(r'function[^\S\n]+\w+\([^)\n]*\$\w+[^)\n]*\)', re.MULTILINE),     # 缺少类型声明
+    re.compile(r'^[^\S\n]*function[^\S\n]+\w+', re.MULTILINE),                   # 缺少访问修饰符
+    re.compile(r'^\$\w+[^\S\n]*=', re.MULTILINE),                                # 全局变量
+)
+
+# 逻辑错误和危险模式检测
+_RE_FUNCTION_DEF = re.compile(r'function\s+(\w+)')
+_RE_WHILE_TRUE = re.compile(r'while\s*\(\s*(true|1|TRUE)\s*\)')
+_RE_FOR_HEADER = re.compile(r'for\s*\(\s*[^;]*;\s*[^;]*;\s*[^)]*\)')
+_RE_FOR_NO_STEP = re.compile(r'for\s*\(\s*\$\w+\s*=\s*\d+\s*;\s*\$\w+\s*[<>]=?\s*\d+\s*;\s*\)')
+_RE_TERMINATION = re.compile(r'(if|return|break|\$\w+\s*[<>]=?)')
+_RE_CATCH = re.compile(r'catch\s*\([^)]*\)\s*\{?\s*\}?')
+_RE_WHILE_ANY = re.compile(r'while\s*\([^)]*\)')
+_RE_DIV_BY_VAR = re.compile(r'/\s*\$\w+')
+_RE_DYN_ARRAY_INDEX = re.compile(r'\$\w+\[\$\w+\]')
+_RE_FILE_OP = re.compile(r'(fopen|file_get_contents|include|require)\(')
+_RE_FILE_CHECK = re.compile(r'(file_exists|is_readable|@)')
+
+# 逻辑/性能规则的字面量触发词合并成一个alternation，整文件一趟finditer
+# 按lastgroup把命中行标到对应类别（Aho-Corasick多模式扫描的stdlib近似）。
+# 'for'出现太频繁，留在主循环里做子串判断
+_RE_TRIGGER_ANY = re.compile(
+    r'(?P<wl>while)'
+    r'|(?P<ct>catch)'
+    r'|(?P<fo>fopen|file_get_contents|include|require)'
+    r'|(?P<cn>count\()')
+
+# 逻辑规则的结构触发模式同样合并成一个alternation整文件扫一趟。
+# 三个分支匹配片段的字符集互不包含彼此的起始字符(f、/、[)，
+# 不会出现一个分支吞掉另一个分支匹配起点导致漏标行的情况；
+# [^\S\n]保证匹配不跨行，命中行上仍会重跑完整规则正则确认
+_RE_LOGIC_TRIGGER = re.compile(
+    r'(?P<fr>for[^\S\n]*\()'
+    r'|(?P<dv>/[^\S\n]*\$)'
+    r'|(?P<ai>\[\$)')
+
+# 性能问题检测
+_RE_LOOP_HEADER = re.compile(r'(for|while|foreach)\s*\(')
+_RE_DB_QUERY_CALL = re.compile(r'(->query\(|->prepare\(|mysql_|mysqli_)')
+_RE_STR_APPEND = re.compile(r'\$\w+\s*\.=')
+_RE_PREG_CALL = re.compile(r'preg_(match|replace)\(')
+_RE_COUNT_CALL = re.compile(r'count\(\$\w+\)')
+
+# 全文件规则扫描的出局触发子串: 任何一条规则要想产出问题，
+# 文件里都至少得出现其中一个子串（'$'几乎覆盖所有真实PHP文件，放最前），
+# 与各规则的逐行子串门控保持一致（同为大小写敏感）
+_SCAN_TRIGGERS = ('$', 'function', 'class', 'while', 'for', 'catch',
+                  'PDO', '->', 'mail(', 'fopen', 'file_get_contents',
+                  'include', 'require')
+
+# PHP超全局变量名（命名检查中排除），frozenset保证O(1)成员判断
+_PHP_SUPERGLOBAL_NAMES = frozenset({
+    'GLOBALS', 'POST', 'GET', 'SESSION', 'COOKIE', 'SERVER', 'FILES', 'ENV'})
+
+# 各异味类型的通用改进建议（模块级常量，避免每次调用重建dict）
+_GENERAL_SUGGESTIONS = {
+    'long_method': [
+        '使用Extract Method重构技术分解长方法',
+        '确保每个方法只做一件事（单一职责原则）',
+        '考虑使用Template Method模式处理重复逻辑'
+    ],
+    'complex_method': [
+        '减少嵌套层次，使用早期返回',
+        '将复杂条件提取为有意义的方法',
+        '考虑使用策略模式替换复杂的条件逻辑'
+    ],
+    'long_parameter_list': [
+        '使用参数对象(Parameter Object)重构',
+        '考虑使用Builder模式构造复杂对象',
+        '检查是否违反了单一职责原则'
+    ],
+    'large_class': [
+        '使用Extract Class重构分解大类',
+        '识别类的不同职责并分离',
+        '考虑使用组合代替继承'
+    ],
+    'naming_issues': [
+        '遵循PSR-1和PSR-12编码规范',
+        '使用有意义的名称描述变量和方法的用途',
+        '保持命名风格的一致性'
+    ]
+}
+
+# 问题类型 -> 代码异味的映射桶（按顺序匹配，O(1)集合运算代替逐个子串扫描）
+# 注意: query_in_loop按既有行为优先归入逻辑错误桶
+# 固定的修复建议文本: 同类问题的N条CodeIssue共享同一个字符串对象，
+# 大批量扫描时不再为每条问题复制几百字节的建议文本
+_SUGG_CLASS_COMMENT = "添加类注释说明:\n1. 类的用途和职责\n2. 主要功能说明\n3. 使用示例\n4. @author, @since等标签"
+_SUGG_PUBLIC_PROPERTY = "修复建议:\n1. 将属性改为private或protected\n2. 提供getter/setter方法\n3. 使用readonly属性(PHP 8.1+)"
+_SUGG_TYPE_DECLARATION = "添加类型声明:\n1. function getUserById(int $userId, bool $includeProfile = null)\n2. 使用返回类型: function getName(): string\n3. 使用nullable类型: ?string"
+_SUGG_ACCESS_MODIFIER = "添加访问修饰符:\n1. public function - 公开方法\n2. private function - 私有方法\n3. protected function - 受保护方法"
+_SUGG_GLOBAL_VARIABLE = "避免全局变量:\n1. 使用类属性\n2. 使用依赖注入\n3. 使用配置类\n4. 使用单例模式(谨慎使用)"
+_SUGG_SQL_INJECTION = "修复建议:\n1. 使用PDO预处理语句: $stmt = $pdo->prepare('SELECT * FROM users WHERE id = ?');\n2. 绑定参数: $stmt->execute([$userId]);\n3. 或使用命名参数: WHERE id = :id"
+_SUGG_XSS = "修复建议:\n1. 使用filter_input()验证输入\n2. 使用htmlspecialchars()防止XSS\n3. 验证数据类型和格式"
+_SUGG_PASSWORD = "修复建议:\n1. 使用password_hash()加密密码\n2. 使用password_verify()验证密码\n3. 永远不要存储明文密码"
+_SUGG_HARDCODED_PDO = "修复建议:\n1. 使用环境变量存储敏感信息\n2. 使用配置文件(不提交到版本控制)\n3. 使用依赖注入管理数据库连接"
+_SUGG_ERROR_HANDLING = "修复建议:\n1. 使用try-catch处理异常\n2. 检查函数返回值\n3. 记录错误日志\n4. 向用户显示友好的错误信息"
+_SUGG_INFINITE_WHILE = "修复建议:\n1. 添加break或return语句\n2. 使用有条件的循环: while($condition)\n3. 添加计数器防止无限循环\n4. 使用for循环替代"
+_SUGG_INFINITE_FOR = "修复建议:\n1. 添加$i++或$i--\n2. 确保循环变量会改变\n3. 检查循环终止条件"
+_SUGG_INFINITE_RECURSION = "修复建议:\n1. 添加递归终止条件\n2. 确保参数在递归中会改变\n3. 添加递归深度限制\n4. 考虑使用迭代替代递归"
+_SUGG_EMPTY_CATCH = "修复建议:\n1. 记录错误日志\n2. 显示用户友好的错误信息\n3. 重新抛出异常\n4. 执行清理操作"
+_SUGG_MEMORY_LEAK = "修复建议:\n1. 在循环外创建对象\n2. 使用unset()释放大对象\n3. 避免在循环内创建不必要的对象\n4. 考虑使用对象池模式"
+_SUGG_DIV_ZERO = "修复建议:\n1. 在除法前检查除数不为零\n2. 使用条件语句: if($divisor != 0)\n3. 抛出适当的异常"
+_SUGG_ARRAY_BOUNDS = "修复建议:\n1. 使用isset()检查键是否存在\n2. 使用array_key_exists()检查\n3. 使用null合并运算符: $arr[$key] ?? $default"
+_SUGG_FILE_OP = "修复建议:\n1. 使用file_exists()检查文件是否存在\n2. 使用is_readable()检查权限\n3. 使用try-catch处理文件异常\n4. 检查函数返回值"
+_SUGG_QUERY_IN_LOOP = "修复建议:\n1. 将查询移到循环外\n2. 使用JOIN合并查询\n3. 使用IN子句批量查询\n4. 考虑使用ORM的eager loading"
+_SUGG_LARGE_FILE_READ = "修复建议:\n1. 对大文件使用fopen/fread分块读取\n2. 使用SplFileObject逐行读取\n3. 设置内存限制检查\n4. 考虑流式处理"
+_SUGG_STR_CONCAT = "修复建议:\n1. 使用数组收集字符串，最后implode()\n2. 使用StringBuilder模式\n3. 预先估算字符串长度"
+_SUGG_PREG_IN_LOOP = "性能优化:\n1. 将正则表达式移到循环外预编译\n2. 使用preg_match_all批量处理\n3. 考虑使用更快的字符串函数"
+_SUGG_COUNT_IN_LOOP = "性能优化:\n1. 将count()结果缓存到变量\n2. 使用foreach替代for循环\n3. 或改为: for($i = 0, $len = count($arr); $i < $len; $i++)"
+
+_CRITICAL_SMELL_BUCKETS = (
+    ('security_issues', frozenset({'sql_injection_risk', 'xss_risk', 'password_security'})),
+    ('logic_errors', frozenset({'infinite_loop_risk', 'infinite_recursion_risk', 'query_in_loop'})),
+    ('error_handling_issues', frozenset({'empty_catch_block'})),
+    ('performance_issues', frozenset({'query_in_loop'})),
+)
+_WARNING_SMELL_BUCKETS = (
+    ('long_method', frozenset({'long_method'})),
+    ('long_parameter_list', frozenset({'long_parameter_list'})),
+    ('naming_issues', frozenset({'naming_violation'})),
+    ('low_cohesion', frozenset({'missing_documentation'})),
+)
+
+# 报告中按严重程度显示的图标，放在模块级避免每条问题都重建dict
+_SEVERITY_ICON = {'error': '🚨', 'warning': '⚠️', 'info': 'ℹ️'}
+
+# HTML转义表: str.translate一次遍历即可处理全部特殊字符，
+# 比逐个str.replace快，代码内容进报告前都要过一遍
+_HTML_TR = str.maketrans({'&': '&amp;', '<': '&lt;', '>': '&gt;', '"': '&quot;', "'": '&#x27;'})
+
+# HTML报告的固定结尾，流式写盘时直接写出
+_HTML_FOOTER = """
+</body>
+</html>
+"""
+
+@njit(cache=True)
+def _scan_method_nesting(is_function, is_control, starts_close):
+    """扫描方法边界与最大嵌套层次的数值状态机（Numba JIT热循环）
+
+    输入是每行的布尔标志数组，字符串处理全部留在Python侧；
+    返回每个方法的(起始行下标, 最大嵌套层次)两个数组，按方法结束顺序排列。
+    """
+    n = is_function.shape[0]
+    method_starts = np.empty(n, dtype=np.int64)
+    method_nestings = np.empty(n, dtype=np.int64)
+    count = 0
+
+    in_method = False
+    method_start = 0
+    max_nesting = 0
+    current_nesting = 0
+
+    for i in range(n):
+        if is_function[i] and not in_method:
+            in_method = True
+            method_start = i
+            max_nesting = 0
+            current_nesting = 0
+
+        if in_method:
+            if is_control[i]:
+                current_nesting += 1
+                if current_nesting > max_nesting:
+                    max_nesting = current_nesting
+
+            if starts_close[i]:
+                current_nesting -= 1
+                if current_nesting < 0:
+                    current_nesting = 0
+
+                if current_nesting == 0:
+                    method_starts[count] = method_start
+                    method_nestings[count] = max_nesting
+                    count += 1
+                    in_method = False
+
+    return method_starts[:count], method_nestings[:count]
+
+@njit(cache=True)
+def _find_block_end(opens, closes, start, max_look):
+    """在行级大括号计数数组上查找从start行开始的代码块结束行（Numba JIT）
+
+    与逐行count('{')/count('}')的扫描语义一致: 先等待第一个'{'出现，
+    之后逐行累计净深度，深度归零的行即块结束行；
+    max_look窗口内未闭合时返回窗口内最后一行。
+    """
+    n = opens.shape[0]
+    end = min(start + max_look, n)
+    depth = 0
+    opened = False
+    last = start
+    for j in range(start, end):
+        if opens[j] > 0:
+            opened = True
+        if opened:
+            depth += opens[j] - closes[j]
+        last = j
+        if opened and depth == 0:
+            return j
+    return last
+
+def _read_file_lines(file_path: str) -> List[str]:
+    """通过mmap读取文件并拆分为行
+
+    大文件直接映射进地址空间读取，只做一次整体解码；
+    用StringIO的universal newline模式拆行，结果与
+    open(..., 'r').readlines()完全一致。
+    """
+    with open(file_path, 'rb') as f:
+        if os.fstat(f.fileno()).st_size == 0:
+            return []
+        with mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) as mm:
+            text = mm[:].decode('utf-8', errors='ignore')
+    return io.StringIO(text, newline=None).readlines()
+
+def _models_dir_state(models_dir: str) -> tuple:
+    """模型目录的mtime快照，作为工件缓存的键，文件更新后缓存自动失效"""
+    state = []
+    for name in ('model_info.json', 'scaler.pkl', 'label_encoder.pkl'):
+        path = os.path.join(models_dir, name)
+        state.append(os.path.getmtime(path) if os.path.exists(path) else None)
+
+    if os.path.isdir(models_dir):
+        for name in sorted(os.listdir(models_dir)):
+            if name.startswith('best_model_') and name.endswith('.pkl'):
+                state.append((name, os.path.getmtime(os.path.join(models_dir, name))))
+
+    return tuple(state)
+
+@functools.lru_cache(maxsize=4)
+def _load_model_artifacts(models_dir: str, state_key: tuple):
+    """加载模型工件并按(目录, mtime快照)缓存
+
+    反序列化sklearn模型可能耗时数十到数百毫秒；多个检测器实例
+    （或反复构造检测器的调用方）共享同一份已加载的工件。
+    state_key仅用于在磁盘文件变化时令缓存失效。
+    """
+    model = None
+    scaler = None
+    label_encoder = None
+    model_info = None
+
+    # 加载模型信息
+    info_path = os.path.join(models_dir, 'model_info.json')
+    if os.path.exists(info_path):
+        with open(info_path, 'r', encoding='utf-8') as f:
+            model_info = json.load(f)
+
+        # 加载最佳模型
+        model_name = model_info['model_name']
+        model_path = os.path.join(models_dir, f'best_model_{model_name}.pkl')
+
+        # joblib.load兼容训练端新写出的压缩工件和旧版的裸pickle
+        if os.path.exists(model_path):
+            model = joblib.load(model_path)
+            print(f"已加载模型: {model_name}")
+
+    # 加载预处理器
+    scaler_path = os.path.join(models_dir, 'scaler.pkl')
+    if os.path.exists(scaler_path):
+        scaler = joblib.load(scaler_path)
+
+    encoder_path = os.path.join(models_dir, 'label_encoder.pkl')
+    if os.path.exists(encoder_path):
+        label_encoder = joblib.load(encoder_path)
+
+    return model, scaler, label_encoder, model_info
+
+@dataclass(slots=True)
 class CodeIssue:
     """具体的代码问题"""
     type: str
@@ -27,9 +376,9 @@ class CodeIssue:
     line_number: int
     line_content: str
     suggestion: str
-    code_snippet: List[str]  # 问题代码片段（包含上下文）
+    code_snippet: Tuple[str, ...] = ()  # 多行上下文片段（单行问题留空，报告只渲染多行上下文）
 
-@dataclass
+@dataclass(slots=True)
 class SmellDetectionResult:
     """代码异味检测结果"""
     file_path: str
@@ -49,6 +398,7 @@ class CodeSmellDetector:
             models_dir: 模型目录路径
         """
         self.models_dir = models_dir
+        self.cache_dir = os.path.join(models_dir, '.cache')
         self.feature_extractor = FeatureExtractor()
         
         # 加载训练好的模型和预处理器
@@ -117,34 +467,10 @@ class CodeSmellDetector:
         return self.smell_type_descriptions.get(smell_type, smell_type)
     
     def _load_model(self):
-        """加载训练好的模型"""
+        """加载训练好的模型（同一模型目录的多个实例共享已反序列化的工件）"""
         try:
-            # 加载模型信息
-            info_path = os.path.join(self.models_dir, 'model_info.json')
-            if os.path.exists(info_path):
-                with open(info_path, 'r', encoding='utf-8') as f:
-                    self.model_info = json.load(f)
-                
-                # 加载最佳模型
-                model_name = self.model_info['model_name']
-                model_path = os.path.join(self.models_dir, f'best_model_{model_name}.pkl')
-                
-                if os.path.exists(model_path):
-                    with open(model_path, 'rb') as f:
-                        self.model = pickle.load(f)
-                    print(f"已加载模型: {model_name}")
-            
-            # 加载预处理器
-            scaler_path = os.path.join(self.models_dir, 'scaler.pkl')
-            if os.path.exists(scaler_path):
-                with open(scaler_path, 'rb') as f:
-                    self.scaler = pickle.load(f)
-            
-            encoder_path = os.path.join(self.models_dir, 'label_encoder.pkl')
-            if os.path.exists(encoder_path):
-                with open(encoder_path, 'rb') as f:
-                    self.label_encoder = pickle.load(f)
-        
+            self.model, self.scaler, self.label_encoder, self.model_info = \
+                _load_model_artifacts(self.models_dir, _models_dir_state(self.models_dir))
         except Exception as e:
             print(f"加载模型时出错: {e}")
             print("将使用规则基础的检测方法")
@@ -152,112 +478,193 @@ class CodeSmellDetector:
     def detect_smells(self, file_path: str) -> SmellDetectionResult:
         """
         检测代码异味
-        
+
         Args:
             file_path: PHP文件路径
-            
+
         Returns:
             检测结果
         """
-        if not os.path.exists(file_path):
-            raise FileNotFoundError(f"文件不存在: {file_path}")
-        
-        # 提取特征
-        features = self.feature_extractor.extract_features(file_path)
-        
-        # 检测详细问题（规则引擎）
-        detailed_issues = self._detect_detailed_issues(file_path)
-        
-        # 检测具体问题
-        issues = self._detect_specific_issues(features, file_path)
-        
-        # 首先检查是否有严重错误（规则引擎优先）
-        critical_issues = [issue for issue in detailed_issues if issue.severity == 'error']
-        
-        if critical_issues:
-            # 有严重错误，直接标记为相应的问题类型
-            smell_type = self._determine_critical_smell_type(critical_issues)
-            confidence = 0.95  # 规则引擎的置信度很高
-        else:
-            # 没有严重错误，使用ML模型预测
-            if self.model and self.scaler and self.label_encoder:
-                smell_type, confidence = self._predict_with_model(features)
+        return self.detect_smells_batch([file_path])[0]
+
+    def detect_smells_batch(self, file_paths: List[str]) -> List[SmellDetectionResult]:
+        """
+        批量检测代码异味
+
+        与逐个调用detect_smells等价，但需要ML模型预测的文件会堆叠成
+        一个特征矩阵，整批只做一次scaler.transform和predict_proba，
+        避免sklearn按单行调用时每次的输入校验与调度开销。
+
+        Args:
+            file_paths: PHP文件路径列表
+
+        Returns:
+            检测结果列表（与输入顺序一致）
+        """
+        results: List[Optional[SmellDetectionResult]] = [None] * len(file_paths)
+        records = []
+        pending = []  # (记录下标, 特征) 等待模型批量预测
+
+        for out_pos, file_path in enumerate(file_paths):
+            # EAFP: 不做exists预检，缓存键的getmtime本身就是存在性检查，
+            # 省掉每个文件重复的一次stat系统调用
+            try:
+                cache_path = self._result_cache_path(file_path)
+            except OSError as e:
+                raise FileNotFoundError(f"文件不存在: {file_path}") from e
+
+            # 磁盘缓存: 文件和模型都没变时直接复用上次的检测结果
+            cached = self._load_cached_result(cache_path)
+            if cached is not None:
+                results[out_pos] = cached
+                continue
+
+            # 只读取一次文件（mmap），特征提取和规则引擎共享同一份行缓冲
+            lines = _read_file_lines(file_path)
+
+            # 提取特征
+            features = self.feature_extractor.extract_features_from_lines(file_path, lines)
+
+            # 检测详细问题（规则引擎）
+            detailed_issues = self._detect_detailed_issues(lines, file_path)
+
+            # 检测具体问题
+            issues = self._detect_specific_issues(features, file_path)
+
+            # 首先检查是否有严重错误（规则引擎优先）
+            critical_issues = [issue for issue in detailed_issues if issue.severity == 'error']
+
+            if critical_issues:
+                # 有严重错误，直接标记为相应的问题类型
+                smell_type = self._determine_critical_smell_type(critical_issues)
+                confidence = 0.95  # 规则引擎的置信度很高
+            elif self.model and self.scaler and self.label_encoder:
+                # 没有严重错误，等待ML模型批量预测
+                smell_type, confidence = None, 0.0
+                pending.append((len(records), features))
             else:
                 # 使用规则基础的检测
                 smell_type, confidence = self._predict_with_rules(features)
-            
-            # 如果有中等严重度问题，调整结果
-            warning_issues = [issue for issue in detailed_issues if issue.severity == 'warning']
-            if warning_issues and smell_type == 'clean':
-                smell_type = self._determine_warning_smell_type(warning_issues)
-                confidence = max(0.75, confidence)  # 提高置信度
-        
-        # 生成建议
-        suggestions = self._generate_suggestions(issues, smell_type)
-        
-        return SmellDetectionResult(
-            file_path=file_path,
-            smell_type=smell_type,
-            confidence=confidence,
-            features=features,
-            issues=issues,
-            suggestions=suggestions,
-            detailed_issues=detailed_issues
-        )
+
+            records.append({
+                'file_path': file_path,
+                'features': features,
+                'detailed_issues': detailed_issues,
+                'issues': issues,
+                'smell_type': smell_type,
+                'confidence': confidence,
+                'has_critical': bool(critical_issues),
+                'out_pos': out_pos,
+                'cache_path': cache_path,
+            })
+
+        # 对所有待预测文件做一次批量推理
+        if pending:
+            self._predict_batch_into(records, pending)
+
+        # 统一的后处理: 警告调整、建议生成
+        for record in records:
+            smell_type = record['smell_type']
+            confidence = record['confidence']
+            detailed_issues = record['detailed_issues']
+
+            # 如果有中等严重度问题，调整结果（仅对无严重错误的文件）
+            if not record['has_critical']:
+                warning_issues = [issue for issue in detailed_issues if issue.severity == 'warning']
+                if warning_issues and smell_type == 'clean':
+                    smell_type = self._determine_warning_smell_type(warning_issues)
+                    confidence = max(0.75, confidence)  # 提高置信度
+
+            # 生成建议
+            suggestions = self._generate_suggestions(record['issues'], smell_type)
+
+            result = SmellDetectionResult(
+                file_path=record['file_path'],
+                smell_type=smell_type,
+                confidence=confidence,
+                features=record['features'],
+                issues=record['issues'],
+                suggestions=suggestions,
+                detailed_issues=detailed_issues
+            )
+            results[record['out_pos']] = result
+            self._store_cached_result(record['cache_path'], result)
+
+        return results
+
+    def _result_cache_path(self, file_path: str) -> str:
+        """计算检测结果的缓存文件路径
+
+        缓存键包含文件绝对路径、mtime和模型目录状态，
+        源文件或模型任一变化都会让旧缓存自然失效。
+        """
+        state = (os.path.abspath(file_path), os.path.getmtime(file_path),
+                 _models_dir_state(self.models_dir))
+        digest = hashlib.md5(repr(state).encode('utf-8')).hexdigest()
+        return os.path.join(self.cache_dir, f"{digest}.pkl")
+
+    def _load_cached_result(self, cache_path: str) -> Optional[SmellDetectionResult]:
+        """读取缓存的检测结果，缓存不存在或损坏时返回None"""
+        if not os.path.exists(cache_path):
+            return None
+        try:
+            with open(cache_path, 'rb') as f:
+                return pickle.load(f)
+        except Exception:
+            return None
+
+    def _store_cached_result(self, cache_path: str, result: SmellDetectionResult):
+        """将检测结果写入磁盘缓存（写失败不影响本次检测）"""
+        try:
+            os.makedirs(self.cache_dir, exist_ok=True)
+            with open(cache_path, 'wb') as f:
+                pickle.dump(result, f)
+        except Exception:
+            pass
+
+    def _predict_batch_into(self, records: List[Dict[str, Any]], pending: List[Tuple[int, CodeFeatures]]):
+        """对等待预测的记录做一次批量模型推理，失败时逐文件退回规则预测"""
+        try:
+            # 一次性预分配整批特征矩阵，write_into逐行原地填充，
+            # 省掉每个文件的to_vector临时数组和vstack的再拷贝
+            X = np.empty((len(pending), N_FEATURES), dtype=np.float32)
+            for row, (_, features) in enumerate(pending):
+                features.write_into(X[row])
+            X_scaled = self.scaler.transform(X)
+
+            predictions = self.model.predict(X_scaled)
+            probabilities = self.model.predict_proba(X_scaled)
+            smell_types = self.label_encoder.inverse_transform(predictions)
+
+            for (idx, _), smell_type, probs in zip(pending, smell_types, probabilities):
+                records[idx]['smell_type'] = smell_type
+                records[idx]['confidence'] = max(probs)
+
+        except Exception as e:
+            print(f"模型预测出错: {e}")
+            for idx, features in pending:
+                smell_type, confidence = self._predict_with_rules(features)
+                records[idx]['smell_type'] = smell_type
+                records[idx]['confidence'] = confidence
     
     def _determine_critical_smell_type(self, critical_issues: List[CodeIssue]) -> str:
         """根据严重错误确定代码异味类型"""
-        issue_types = [issue.type for issue in critical_issues]
-        
+        issue_types = {issue.type for issue in critical_issues}
+
         # 根据错误类型映射到代码异味
-        if any('sql_injection' in t or 'xss' in t or 'security' in t for t in issue_types):
-            return 'security_issues'
-        elif any('infinite' in t or 'loop' in t for t in issue_types):
-            return 'logic_errors'
-        elif any('empty_catch' in t for t in issue_types):
-            return 'error_handling_issues'
-        elif any('performance' in t or 'query_in_loop' in t for t in issue_types):
-            return 'performance_issues'
-        else:
-            return 'critical_issues'
-    
+        for smell_type, bucket in _CRITICAL_SMELL_BUCKETS:
+            if issue_types & bucket:
+                return smell_type
+        return 'critical_issues'
+
     def _determine_warning_smell_type(self, warning_issues: List[CodeIssue]) -> str:
         """根据警告问题确定代码异味类型"""
-        issue_types = [issue.type for issue in warning_issues]
-        
-        if any('long_method' in t for t in issue_types):
-            return 'long_method'
-        elif any('long_parameter' in t for t in issue_types):
-            return 'long_parameter_list'
-        elif any('naming' in t for t in issue_types):
-            return 'naming_issues'
-        elif any('missing_comment' in t for t in issue_types):
-            return 'low_cohesion'
-        else:
-            return 'code_quality_issues'
-    
-    def _predict_with_model(self, features: CodeFeatures) -> Tuple[str, float]:
-        """使用机器学习模型预测"""
-        try:
-            # 转换特征为向量
-            feature_vector = features.to_vector().reshape(1, -1)
-            
-            # 标准化特征
-            feature_vector_scaled = self.scaler.transform(feature_vector)
-            
-            # 预测
-            prediction = self.model.predict(feature_vector_scaled)[0]
-            probabilities = self.model.predict_proba(feature_vector_scaled)[0]
-            
-            # 获取预测的类别和置信度
-            smell_type = self.label_encoder.inverse_transform([prediction])[0]
-            confidence = max(probabilities)
-            
-            return smell_type, confidence
-            
-        except Exception as e:
-            print(f"模型预测出错: {e}")
-            return self._predict_with_rules(features)
+        issue_types = {issue.type for issue in warning_issues}
+
+        for smell_type, bucket in _WARNING_SMELL_BUCKETS:
+            if issue_types & bucket:
+                return smell_type
+        return 'code_quality_issues'
     
     def _predict_with_rules(self, features: CodeFeatures) -> Tuple[str, float]:
         """使用规则基础的预测"""
@@ -383,789 +790,778 @@ class CodeSmellDetector:
                 suggestions.append(self.smell_rules[issue_type]['suggestion'])
         
         # 根据主要异味类型添加通用建议
-        general_suggestions = {
-            'long_method': [
-                '使用Extract Method重构技术分解长方法',
-                '确保每个方法只做一件事（单一职责原则）',
-                '考虑使用Template Method模式处理重复逻辑'
-            ],
-            'complex_method': [
-                '减少嵌套层次，使用早期返回',
-                '将复杂条件提取为有意义的方法',
-                '考虑使用策略模式替换复杂的条件逻辑'
-            ],
-            'long_parameter_list': [
-                '使用参数对象(Parameter Object)重构',
-                '考虑使用Builder模式构造复杂对象',
-                '检查是否违反了单一职责原则'
-            ],
-            'large_class': [
-                '使用Extract Class重构分解大类',
-                '识别类的不同职责并分离',
-                '考虑使用组合代替继承'
-            ],
-            'naming_issues': [
-                '遵循PSR-1和PSR-12编码规范',
-                '使用有意义的名称描述变量和方法的用途',
-                '保持命名风格的一致性'
-            ]
-        }
-        
-        if smell_type in general_suggestions:
-            suggestions.extend(general_suggestions[smell_type])
-        
-        # 去重并限制建议数量
-        suggestions = list(set(suggestions))[:5]
+        if smell_type in _GENERAL_SUGGESTIONS:
+            suggestions.extend(_GENERAL_SUGGESTIONS[smell_type])
         
+        # 去重并限制建议数量（dict.fromkeys保持插入顺序，输出稳定）
+        suggestions = list(dict.fromkeys(suggestions))[:5]
+
         return suggestions
     
-    def _detect_detailed_issues(self, file_path: str) -> List[CodeIssue]:
-        """检测具体的代码问题并定位到行号"""
-        detailed_issues = []
-        
+    def _detect_detailed_issues(self, lines: List[str], file_path: str = '') -> List[CodeIssue]:
+        """检测具体的代码问题并定位到行号（使用调用方预先读取的行缓冲）"""
         try:
-            with open(file_path, 'r', encoding='utf-8', errors='ignore') as f:
-                lines = f.readlines()
-            
-            # 1. 检测长方法
-            detailed_issues.extend(self._find_long_methods(lines))
-            
-            # 2. 检测复杂方法
-            detailed_issues.extend(self._find_complex_methods(lines))
-            
-            # 3. 检测长参数列表
-            detailed_issues.extend(self._find_long_parameter_lists(lines))
-            
-            # 4. 检测命名问题
-            detailed_issues.extend(self._find_naming_issues(lines))
-            
-            # 5. 检测注释不足的方法
-            detailed_issues.extend(self._find_uncommented_methods(lines))
-            
-            # 6. 检测SQL注入风险
-            detailed_issues.extend(self._find_sql_injection_risks(lines))
-            
-            # 7. 检测其他安全问题
-            detailed_issues.extend(self._find_security_issues(lines))
-            
-            # 8. 检测代码质量问题
-            detailed_issues.extend(self._find_code_quality_issues(lines))
-            
-            # 9. 检测逻辑错误和危险模式
-            detailed_issues.extend(self._find_logic_errors(lines))
-            
-            # 10. 检测性能问题
-            detailed_issues.extend(self._find_performance_issues(lines))
-            
+            return self._scan_lines(lines)
         except Exception as e:
             print(f"分析文件 {file_path} 时出错: {e}")
-        
-        return detailed_issues
-    
-    def _find_long_methods(self, lines: List[str]) -> List[CodeIssue]:
-        """查找长方法"""
-        issues = []
-        
+            return []
+
+    def _scan_lines(self, lines: List[str]) -> List[CodeIssue]:
+        """单遍扫描所有行，完成全部规则检查
+
+        原先10个_find_*辅助方法各自完整遍历一遍文件；这里把它们的逐行
+        逻辑合并到一个循环中，stripped每行只计算一次。各类检查结果分别
+        累积，最后按原有类别顺序拼接，保持输出顺序不变。
+        """
+        long_method_issues = []       # 1. 长方法（含签名中的长参数列表）
+        complex_method_issues = []    # 2. 复杂方法
+        param_list_issues = []        # 3. 长参数列表
+        naming_issues = []            # 4. 命名问题
+        uncommented_issues = []       # 5. 缺少注释的方法
+        sql_issues = []               # 6. SQL注入风险
+        security_issues = []          # 7. 其他安全问题
+        quality_issues = []           # 8. 代码质量问题
+        logic_issues = []             # 9. 逻辑错误和危险模式
+        performance_issues = []       # 10. 性能问题
+
+        n_lines = len(lines)
+        if n_lines == 0:
+            return []
+
+        # 快速出局: 每条规则命中都至少依赖其中一个触发子串，
+        # 全都不含（非PHP或平凡文件）时直接返回，跳过全部正则与逐行工作
+        content = ''.join(lines)
+        if not any(t in content for t in _SCAN_TRIGGERS):
+            return []
+
+        # 每行只strip/rstrip一次，供布尔标志、主循环和代码片段共用
+        stripped_lines = [l.strip() for l in lines]
+        # 子串预过滤都在小写副本上做：被守护的正则带IGNORECASE，
+        # 在原串上包含检查会漏掉大写/首字母大写的关键字
+        stripped_lower_lines = [s.lower() for s in stripped_lines]
+        rstripped_lines = [l.rstrip() for l in lines]
+
+        # 将整份文件拼成一个字节缓冲，每行的大括号计数通过布尔掩码 +
+        # reduceat一次性算出，替代N次Python级的str.count调用。
+        # '{'/'}'是ASCII字节，不会出现在UTF-8多字节序列中，按字节统计是精确的
+        buf = np.frombuffer(content.encode('utf-8'), dtype=np.uint8)
+        line_lens = np.fromiter((len(l.encode('utf-8')) for l in lines),
+                                dtype=np.int64, count=n_lines)
+        line_starts = np.concatenate(([0], np.cumsum(line_lens[:-1])))
+        opens = np.add.reduceat((buf == ord('{')).astype(np.int64), line_starts)
+        closes = np.add.reduceat((buf == ord('}')).astype(np.int64), line_starts)
+
+        # brace_depth[j]是前j+1行的净括号深度（前缀和）。
+        # 方法结束行的查找由此变成对前缀和数组的一次向量化搜索，
+        # 不再为每个方法重新逐行数大括号（嵌套方法多时是O(N²)）
+        brace_depth = np.cumsum(opens - closes)
+
+        # ---------- 2. 复杂方法（基于嵌套层次） ----------
+        # 字符串匹配留在Python侧生成布尔标志数组，数值状态机交给JIT内核
+        is_function = np.fromiter(
+            ('function' in low and _RE_FUNCTION_SHORT.search(s) is not None
+             for s, low in zip(stripped_lines, stripped_lower_lines)),
+            dtype=np.bool_, count=n_lines)
+        is_control = np.fromiter(
+            (('if' in low or 'for' in low or 'while' in low or 'switch' in low)
+             and _RE_CONTROL.search(s) is not None
+             for s, low in zip(stripped_lines, stripped_lower_lines)),
+            dtype=np.bool_, count=n_lines)
+        starts_close = np.fromiter(
+            (s.startswith('}') for s in stripped_lines),
+            dtype=np.bool_, count=n_lines)
+
+        method_starts, method_nestings = _scan_method_nesting(
+            is_function, is_control, starts_close)
+
+        # 多模式安全扫描: 三条安全正则合并后对全文做一趟finditer，
+        # 把命中范围映射回行号作为候选行；主循环里只有候选行才跑逐条安全规则
+        char_lens = np.fromiter((len(l) for l in lines), dtype=np.int64, count=n_lines)
+        char_starts = np.concatenate(([0], np.cumsum(char_lens[:-1])))
+        security_candidate = np.zeros(n_lines, dtype=np.bool_)
+        for sec_match in _RE_SECURITY_ANY.finditer(content):
+            first = int(np.searchsorted(char_starts, sec_match.start(), side='right')) - 1
+            last = int(np.searchsorted(char_starts, sec_match.end() - 1, side='right')) - 1
+            security_candidate[first:last + 1] = True
+
+        # 逻辑/性能触发词的多模式扫描: 触发词都是不含空白的字面量，
+        # 不会跨行，按匹配起点标记所在行即可
+        while_cand = np.zeros(n_lines, dtype=np.bool_)
+        catch_cand = np.zeros(n_lines, dtype=np.bool_)
+        fileop_cand = np.zeros(n_lines, dtype=np.bool_)
+        count_cand = np.zeros(n_lines, dtype=np.bool_)
+        trigger_flags = {'wl': while_cand, 'ct': catch_cand,
+                         'fo': fileop_cand, 'cn': count_cand}
+        for trig in _RE_TRIGGER_ANY.finditer(content):
+            line_idx = int(np.searchsorted(char_starts, trig.start(), side='right')) - 1
+            trigger_flags[trig.lastgroup][line_idx] = True
+
+        # 逻辑规则的结构触发模式: for头/变量除法/动态数组下标
+        for_cand = np.zeros(n_lines, dtype=np.bool_)
+        div_cand = np.zeros(n_lines, dtype=np.bool_)
+        arridx_cand = np.zeros(n_lines, dtype=np.bool_)
+        logic_flags = {'fr': for_cand, 'dv': div_cand, 'ai': arridx_cand}
+        for trig in _RE_LOGIC_TRIGGER.finditer(content):
+            line_idx = int(np.searchsorted(char_starts, trig.start(), side='right')) - 1
+            logic_flags[trig.lastgroup][line_idx] = True
+
+        # 质量规则批量探测: 正则引擎在C层一口气扫完整份stripped文本，
+        # Python只在命中处回到解释器，命中偏移用searchsorted反查行号。
+        # (行号, 规则序号)排序后按行主序发射，与逐行扫描的输出顺序一致
+        stripped_source = '\n'.join(stripped_lines)
+        s_lens = np.fromiter((len(s) + 1 for s in stripped_lines),
+                             dtype=np.int64, count=n_lines)
+        s_starts = np.concatenate(([0], np.cumsum(s_lens[:-1])))
+        quality_events = set()
+        for q_rank, q_probe in enumerate(_QUALITY_PROBES):
+            for q_match in q_probe.finditer(stripped_source):
+                q_line = int(np.searchsorted(s_starts, q_match.start(), side='right')) - 1
+                quality_events.add((q_line, q_rank))
+
+        for q_line, q_rank in sorted(quality_events):
+            q_stripped = stripped_lines[q_line]
+
+            if q_rank == 0:
+                # 检测缺少类注释: 检查前面几行是否有注释
+                has_comment = False
+                for j in range(max(0, q_line - 3), q_line):
+                    if ('*' in lines[j] or '//' in lines[j]) and _RE_COMMENT_MARK.search(lines[j]):
+                        has_comment = True
+                        break
+
+                if not has_comment:
+                    quality_issues.append(CodeIssue(
+                        type="missing_class_comment",
+                        severity="info",
+                        message=f"第{q_line+1}行缺少类注释",
+                        line_number=q_line + 1,
+                        line_content=q_stripped,
+                        suggestion=_SUGG_CLASS_COMMENT
+                    ))
+
+            elif q_rank == 1:
+                # 检测public属性
+                quality_issues.append(CodeIssue(
+                    type="public_property",
+                    severity="warning",
+                    message=f"第{q_line+1}行违反封装原则: public属性",
+                    line_number=q_line + 1,
+                    line_content=q_stripped,
+                    suggestion=_SUGG_PUBLIC_PROPERTY
+                ))
+
+            elif q_rank == 2:
+                # 检测缺少类型声明
+                if not _RE_TYPE_HINT.search(q_stripped):
+                    quality_issues.append(CodeIssue(
+                        type="missing_type_declaration",
+                        severity="info",
+                        message=f"第{q_line+1}行缺少参数类型声明",
+                        line_number=q_line + 1,
+                        line_content=q_stripped,
+                        suggestion=_SUGG_TYPE_DECLARATION
+                    ))
+
+            elif q_rank == 3:
+                # 检测缺少访问修饰符
+                if not _RE_ACCESS_MODIFIER.search(q_stripped):
+                    quality_issues.append(CodeIssue(
+                        type="missing_access_modifier",
+                        severity="warning",
+                        message=f"第{q_line+1}行缺少访问修饰符",
+                        line_number=q_line + 1,
+                        line_content=q_stripped,
+                        suggestion=_SUGG_ACCESS_MODIFIER
+                    ))
+
+            else:
+                # 检测全局变量
+                quality_issues.append(CodeIssue(
+                    type="global_variable",
+                    severity="warning",
+                    message=f"第{q_line+1}行使用全局变量",
+                    line_number=q_line + 1,
+                    line_content=q_stripped,
+                    suggestion=_SUGG_GLOBAL_VARIABLE
+                ))
+
+        for cm_method_start, max_nesting in zip(method_starts, method_nestings):
+            if max_nesting > 4:  # 复杂度阈值
+                cm_method_start = int(cm_method_start)
+                cm_method_name = _RE_FUNCTION_SHORT.search(
+                    stripped_lines[cm_method_start]).group(1)
+                complex_method_issues.append(CodeIssue(
+                    type="complex_method",
+                    severity="error",
+                    message=f"方法 '{cm_method_name}' 嵌套过深 (最大嵌套层次: {max_nesting})",
+                    line_number=cm_method_start + 1,
+                    line_content=stripped_lines[cm_method_start],
+                    suggestion=f"简化 {cm_method_name} 方法：使用早期返回减少嵌套，将复杂逻辑提取为独立方法",
+                    code_snippet=tuple(rstripped_lines[cm_method_start:min(cm_method_start + 10, n_lines)])
+                ))
+
+        # 性能规则的单趟扫描状态: 尚未命中的循环头行号与待发射事件
+        pend_query = []
+        pend_concat = []
+        pend_preg = []
+        perf_events = []  # (循环头/命中行, 规则序号, 命中行)
+
         for i, line in enumerate(lines):
-            stripped = line.strip()
-            
+            stripped = stripped_lines[i]
+            stripped_lower = stripped_lower_lines[i]
+
+            # 廉价的子串预过滤标志: str.__contains__是C实现，
+            # 比在不含触发词的行上跑正则便宜一到两个数量级。
+            # 在小写副本上判断：被守护的正则都带IGNORECASE，
+            # 原串包含检查会漏掉大写关键字（如PUBLIC FUNCTION）
+            has_function = 'function' in stripped_lower
+            has_class = 'class' in stripped_lower
+            has_dollar = '$' in stripped
+
+            # ---------- 1. 长方法 / 签名参数过多 ----------
             # 检测方法开始 - 简化的正则表达式
-            method_match = re.search(r'function\s+([a-zA-Z_][a-zA-Z0-9_]*)\s*\(([^)]*)\)', stripped, re.IGNORECASE)
+            method_match = _RE_FUNCTION.search(stripped) if has_function else None
             if method_match:
                 method_name = method_match.group(1)
                 params_str = method_match.group(2)
                 method_start = i
-                
-                # 简单地向下查找方法结束 - 查找匹配的大括号
-                brace_count = 0
-                method_end = i
-                found_start_brace = False
-                
-                # 从方法开始行开始计算
-                for j in range(i, len(lines)):
-                    current_line = lines[j]
-                    brace_count += current_line.count('{')
-                    brace_count -= current_line.count('}')
-                    
-                    if brace_count > 0:
-                        found_start_brace = True
-                    
-                    if found_start_brace and brace_count == 0:
-                        method_end = j
-                        break
-                
+
+                # 查找方法结束 - 在预计算的前缀和上定位匹配的大括号
+                method_end = self._find_method_end(brace_depth, i)
+
                 method_length = method_end - method_start + 1
-                
+
                 # 获取完整的方法签名（可能跨多行）
                 method_signature = stripped
                 if ')' not in method_signature and i + 1 < len(lines):
-                    method_signature += " " + lines[i + 1].strip()
-                
+                    method_signature += " " + stripped_lines[i + 1]
+
                 # 检查长方法
                 if method_length > 20:
-                    code_snippet = lines[method_start:min(method_start + 10, len(lines))]
-                    issues.append(CodeIssue(
+                    long_method_issues.append(CodeIssue(
                         type="long_method",
                         severity="warning",
                         message=f"长方法 '{method_name}' ({method_length} 行，第{method_start + 1}-{method_end + 1}行)",
                         line_number=method_start + 1,
                         line_content=method_signature,
                         suggestion=f"将 '{method_name}' 方法分解为多个较小的方法。建议:\n1. 提取验证逻辑为独立方法\n2. 提取数据处理逻辑\n3. 提取通知发送逻辑\n4. 每个方法应少于30行",
-                        code_snippet=[line.rstrip() for line in code_snippet]
+                        code_snippet=tuple(rstripped_lines[method_start:min(method_start + 10, len(lines))])
                     ))
-                
+
                 # 检查参数数量
                 if params_str.strip():
                     # 处理跨行参数
                     full_params = params_str
                     if ')' not in line and i + 1 < len(lines):
                         for k in range(i + 1, min(i + 10, len(lines))):
-                            full_params += " " + lines[k].strip()
+                            full_params += " " + stripped_lines[k]
                             if ')' in lines[k]:
                                 break
-                    
+
                     # 清理参数字符串
-                    full_params = re.sub(r'\).*$', '', full_params)  # 移除)后的内容
+                    full_params = _RE_PARAM_TAIL.sub('', full_params)  # 移除)后的内容
                     param_list = [p.strip() for p in full_params.split(',') if p.strip()]
-                    
+
                     if len(param_list) > 4:
                         # 提取参数名
                         param_names = []
                         for param in param_list:
-                            param_clean = re.sub(r'^\s*\$?', '$', param.strip())  # 确保有$符号
-                            param_clean = re.sub(r'\s*=.*$', '', param_clean)      # 去掉默认值
+                            param_clean = _RE_PARAM_PREFIX.sub('$', param.strip())  # 确保有$符号
+                            param_clean = _RE_PARAM_DEFAULT.sub('', param_clean)    # 去掉默认值
                             param_names.append(param_clean)
-                        
-                        issues.append(CodeIssue(
+
+                        long_method_issues.append(CodeIssue(
                             type="long_parameter_list",
                             severity="warning",
                             message=f"方法 '{method_name}' 参数过多 ({len(param_list)} 个参数)",
                             line_number=method_start + 1,
                             line_content=method_signature,
-                            suggestion=f"重构 '{method_name}' 的参数列表:\n1. 创建配置对象: UserData, ValidationConfig, EmailConfig等\n2. 使用数组或对象传递相关参数\n3. 考虑方法是否职责过多\n\n当前参数:\n{chr(10).join(f'  - {param}' for param in param_names)}",
-                            code_snippet=[method_signature]
-                        ))
-        
-        return issues
-    
-    def _find_complex_methods(self, lines: List[str]) -> List[CodeIssue]:
-        """查找复杂方法（基于嵌套层次）"""
-        issues = []
-        in_method = False
-        method_start = 0
-        method_name = ""
-        max_nesting = 0
-        current_nesting = 0
-        
-        for i, line in enumerate(lines):
-            stripped = line.strip()
-            
-            # 检测方法开始
-            method_match = re.search(r'function\s+(\w+)\s*\(', stripped, re.IGNORECASE)
-            if method_match and not in_method:
-                method_name = method_match.group(1)
-                method_start = i
-                in_method = True
-                max_nesting = 0
-                current_nesting = 0
-            
-            if in_method:
-                # 检测控制结构
-                if re.search(r'\b(if|for|foreach|while|switch)\b', stripped, re.IGNORECASE):
-                    current_nesting += 1
-                    max_nesting = max(max_nesting, current_nesting)
-                
-                # 减少嵌套（简化版）
-                if stripped.startswith('}'):
-                    current_nesting = max(0, current_nesting - 1)
-                
-                # 方法结束检测
-                if stripped.startswith('}') and current_nesting == 0:
-                    if max_nesting > 4:  # 复杂度阈值
-                        code_snippet = lines[method_start:min(method_start + 10, len(lines))]
-                        issues.append(CodeIssue(
-                            type="complex_method",
-                            severity="error",
-                            message=f"方法 '{method_name}' 嵌套过深 (最大嵌套层次: {max_nesting})",
-                            line_number=method_start + 1,
-                            line_content=lines[method_start].strip(),
-                            suggestion=f"简化 {method_name} 方法：使用早期返回减少嵌套，将复杂逻辑提取为独立方法",
-                            code_snippet=[line.rstrip() for line in code_snippet]
+                            suggestion=f"重构 '{method_name}' 的参数列表:\n1. 创建配置对象: UserData, ValidationConfig, EmailConfig等\n2. 使用数组或对象传递相关参数\n3. 考虑方法是否职责过多\n\n当前参数:\n{chr(10).join(f'  - {param}' for param in param_names)}"
                         ))
-                    
-                    in_method = False
-        
-        return issues
-    
-    def _find_long_parameter_lists(self, lines: List[str]) -> List[CodeIssue]:
-        """查找长参数列表"""
-        issues = []
-        
-        for i, line in enumerate(lines):
-            # 查找函数定义
-            method_match = re.search(r'function\s+(\w+)\s*\(([^)]*)\)', line, re.IGNORECASE)
+
+            # ---------- 3. 长参数列表 ----------
             if method_match:
-                method_name = method_match.group(1)
-                params_str = method_match.group(2)
-                
+                pl_method_name = method_match.group(1)
+                pl_params_str = method_match.group(2)
+
                 # 计算参数数量
-                if params_str.strip():
-                    params = [p.strip() for p in params_str.split(',') if p.strip()]
+                if pl_params_str.strip():
+                    params = [p.strip() for p in pl_params_str.split(',') if p.strip()]
                     param_count = len(params)
-                    
+
                     if param_count > 5:  # 参数过多阈值
-                        issues.append(CodeIssue(
+                        param_list_issues.append(CodeIssue(
                             type="long_parameter_list",
                             severity="warning",
-                            message=f"方法 '{method_name}' 参数过多 ({param_count} 个参数)",
+                            message=f"方法 '{pl_method_name}' 参数过多 ({param_count} 个参数)",
                             line_number=i + 1,
-                            line_content=line.strip(),
-                            suggestion=f"使用参数对象重构 {method_name}，或考虑是否违反了单一职责原则",
-                            code_snippet=[line.strip()]
+                            line_content=stripped,
+                            suggestion=f"使用参数对象重构 {pl_method_name}，或考虑是否违反了单一职责原则"
                         ))
-        
-        return issues
-    
-    def _find_naming_issues(self, lines: List[str]) -> List[CodeIssue]:
-        """查找命名约定问题"""
-        issues = []
-        
-        for i, line in enumerate(lines):
-            stripped = line.strip()
-            
+
+            # ---------- 4. 命名约定问题 ----------
             # 检查类名
-            class_match = re.search(r'class\s+(\w+)', stripped, re.IGNORECASE)
+            class_match = _RE_CLASS.search(stripped) if has_class else None
             if class_match:
                 class_name = class_match.group(1)
-                if not re.match(r'^[A-Z][a-zA-Z0-9]*$', class_name):
+                if not _RE_PASCAL_CASE.match(class_name):
                     suggested_name = self._to_pascal_case(class_name)
-                    issues.append(CodeIssue(
+                    naming_issues.append(CodeIssue(
                         type="naming_violation",
                         severity="info",
                         message=f"类名违反PSR-1规范: '{class_name}'",
                         line_number=i + 1,
                         line_content=stripped,
-                        suggestion=f"类名应使用PascalCase命名:\n修改前: class {class_name}\n修改后: class {suggested_name}",
-                        code_snippet=[stripped]
+                        suggestion=f"类名应使用PascalCase命名:\n修改前: class {class_name}\n修改后: class {suggested_name}"
                     ))
-            
+
             # 检查方法名
-            method_match = re.search(r'function\s+([a-zA-Z_][a-zA-Z0-9_]*)', stripped, re.IGNORECASE)
-            if method_match:
-                method_name = method_match.group(1)
-                if not method_name.startswith('__') and not re.match(r'^[a-z][a-zA-Z0-9]*$', method_name):
-                    suggested_name = self._to_camel_case(method_name)
-                    issues.append(CodeIssue(
-                        type="naming_violation", 
+            fn_match = _RE_FUNCTION_NAME.search(stripped) if has_function else None
+            if fn_match:
+                fn_name = fn_match.group(1)
+                if not fn_name.startswith('__') and not _RE_CAMEL_CASE.match(fn_name):
+                    suggested_name = self._to_camel_case(fn_name)
+                    naming_issues.append(CodeIssue(
+                        type="naming_violation",
                         severity="info",
-                        message=f"方法名违反PSR-1规范: '{method_name}'",
+                        message=f"方法名违反PSR-1规范: '{fn_name}'",
                         line_number=i + 1,
                         line_content=stripped,
-                        suggestion=f"方法名应使用camelCase命名:\n修改前: function {method_name}(...)\n修改后: function {suggested_name}(...)",
-                        code_snippet=[stripped]
+                        suggestion=f"方法名应使用camelCase命名:\n修改前: function {fn_name}(...)\n修改后: function {suggested_name}(...)"
                     ))
-            
+
             # 检查变量名
-            var_matches = re.findall(r'\$([A-Z_][A-Z0-9_]*)', line)
+            var_matches = _RE_UPPER_VAR.findall(line) if has_dollar else []
             for var_name in var_matches:
-                if var_name not in ['GLOBALS', 'POST', 'GET', 'SESSION', 'COOKIE', 'SERVER', 'FILES', 'ENV']:  # 排除超全局变量
+                if var_name not in _PHP_SUPERGLOBAL_NAMES:  # 排除超全局变量
                     suggested_name = self._to_camel_case(var_name)
-                    issues.append(CodeIssue(
+                    naming_issues.append(CodeIssue(
                         type="naming_violation",
-                        severity="info", 
+                        severity="info",
                         message=f"变量名违反约定: '\${var_name}'",
                         line_number=i + 1,
                         line_content=stripped,
-                        suggestion=f"变量名应使用camelCase:\n修改前: \${var_name}\n修改后: \${suggested_name}",
-                        code_snippet=[stripped]
+                        suggestion=f"变量名应使用camelCase:\n修改前: \${var_name}\n修改后: \${suggested_name}"
                     ))
-        
-        return issues
-    
-    def _find_uncommented_methods(self, lines: List[str]) -> List[CodeIssue]:
-        """查找缺少注释的方法"""
-        issues = []
-        
-        for i, line in enumerate(lines):
-            method_match = re.search(r'(public|private|protected)\s+function\s+(\w+)', line, re.IGNORECASE)
-            if method_match:
-                method_name = method_match.group(2)
-                
+
+            # ---------- 5. 缺少注释的方法 ----------
+            vis_match = _RE_METHOD_VIS.search(line) if has_function else None
+            if vis_match:
+                vis_method_name = vis_match.group(2)
+
                 # 检查前面几行是否有注释
                 has_comment = False
                 for j in range(max(0, i - 3), i):
                     if '//' in lines[j] or '/*' in lines[j] or '*' in lines[j]:
                         has_comment = True
                         break
-                
+
                 if not has_comment:
-                    issues.append(CodeIssue(
+                    uncommented_issues.append(CodeIssue(
                         type="missing_documentation",
                         severity="info",
-                        message=f"方法 '{method_name}' 缺少文档注释",
+                        message=f"方法 '{vis_method_name}' 缺少文档注释",
                         line_number=i + 1,
-                        line_content=line.strip(),
-                        suggestion=f"为 {method_name} 方法添加PHPDoc注释，说明功能、参数和返回值",
-                        code_snippet=[line.strip()]
+                        line_content=stripped,
+                        suggestion=f"为 {vis_method_name} 方法添加PHPDoc注释，说明功能、参数和返回值"
                     ))
-        
-        return issues
-    
-    def _find_sql_injection_risks(self, lines: List[str]) -> List[CodeIssue]:
-        """查找SQL注入风险"""
-        issues = []
-        
-        for i, line in enumerate(lines):
-            stripped = line.strip()
-            
-            # 检测直接字符串拼接的SQL - 更全面的模式
-            sql_patterns = [
-                r'(SELECT|INSERT|UPDATE|DELETE).*\$\w+',  # 直接变量拼接
-                r'(SELECT|INSERT|UPDATE|DELETE).*\.\s*\$',  # . $var拼接
-                r'(SELECT|INSERT|UPDATE|DELETE).*".*\$.*"',  # 双引号内变量拼接
-                r'(SELECT|INSERT|UPDATE|DELETE).*\'.*\$.*\'',  # 单引号内变量拼接
-            ]
-            
-            for pattern in sql_patterns:
-                if re.search(pattern, stripped, re.IGNORECASE):
+
+            # ---------- 6. SQL注入风险 ----------
+            # 廉价预过滤: 没有SQL关键字的行直接跳过，不触发正则
+            if any(keyword in stripped_lower for keyword in _SQL_KEYWORDS):
+                # 检测直接字符串拼接的SQL - 合并后的模式一次扫描
+                if _RE_SQL_ANY.search(stripped):
                     # 排除已经使用预处理语句的情况
-                    if not re.search(r'(prepare|PDO::PARAM|bindParam|bindValue|\?)', stripped, re.IGNORECASE):
+                    if not _RE_SQL_SAFE.search(stripped):
                         # 获取上下文
                         context_start = max(0, i - 2)
                         context_end = min(len(lines), i + 3)
-                        context = [lines[j].rstrip() for j in range(context_start, context_end)]
-                        
-                        issues.append(CodeIssue(
+                        context = rstripped_lines[context_start:context_end]
+
+                        sql_issues.append(CodeIssue(
                             type="sql_injection_risk",
                             severity="error",
                             message=f"第{i+1}行发现SQL注入风险: 直接拼接变量到SQL语句",
                             line_number=i + 1,
                             line_content=stripped,
-                            suggestion="修复建议:\n1. 使用PDO预处理语句: $stmt = $pdo->prepare('SELECT * FROM users WHERE id = ?');\n2. 绑定参数: $stmt->execute([$userId]);\n3. 或使用命名参数: WHERE id = :id",
-                            code_snippet=context
+                            suggestion=_SUGG_SQL_INJECTION,
+                            code_snippet=tuple(context)
                         ))
-                        break  # 避免重复检测同一行
-        
-        return issues
-    
-    def _find_security_issues(self, lines: List[str]) -> List[CodeIssue]:
-        """查找安全问题"""
-        issues = []
-        
-        for i, line in enumerate(lines):
-            stripped = line.strip()
-            
-            # 1. 检测直接使用$_GET/$_POST/$_REQUEST
-            if re.search(r'\$_(GET|POST|REQUEST|COOKIE)\[', stripped):
-                if not re.search(r'(filter_|htmlspecialchars|strip_tags|mysqli_real_escape_string)', stripped):
-                    issues.append(CodeIssue(
-                        type="xss_risk",
-                        severity="error", 
-                        message=f"第{i+1}行XSS风险: 直接使用用户输入",
-                        line_number=i + 1,
-                        line_content=stripped,
-                        suggestion="修复建议:\n1. 使用filter_input()验证输入\n2. 使用htmlspecialchars()防止XSS\n3. 验证数据类型和格式",
-                        code_snippet=[stripped]
-                    ))
-            
-            # 2. 检测明文密码存储
-            if re.search(r'\$.*password.*=.*\$.*password', stripped, re.IGNORECASE):
-                if not re.search(r'(password_hash|hash|crypt|bcrypt)', stripped, re.IGNORECASE):
-                    issues.append(CodeIssue(
-                        type="password_security",
-                        severity="error",
-                        message=f"第{i+1}行密码安全: 密码可能以明文存储",
+
+            # ---------- 7. 其他安全问题 ----------
+            # 只有全文多模式扫描标出的候选行才进入逐条安全规则
+            if security_candidate[i]:
+                # 检测直接使用$_GET/$_POST/$_REQUEST
+                if '$_' in stripped and _RE_SUPERGLOBAL.search(stripped):
+                    if not _RE_SANITIZER.search(stripped):
+                        security_issues.append(CodeIssue(
+                            type="xss_risk",
+                            severity="error",
+                            message=f"第{i+1}行XSS风险: 直接使用用户输入",
+                            line_number=i + 1,
+                            line_content=stripped,
+                            suggestion=_SUGG_XSS
+                        ))
+
+                # 检测明文密码存储
+                if 'password' in stripped_lower and _RE_PLAIN_PASSWORD.search(stripped):
+                    if not _RE_PASSWORD_HASH.search(stripped):
+                        security_issues.append(CodeIssue(
+                            type="password_security",
+                            severity="error",
+                            message=f"第{i+1}行密码安全: 密码可能以明文存储",
+                            line_number=i + 1,
+                            line_content=stripped,
+                            suggestion=_SUGG_PASSWORD
+                        ))
+
+                # 检测硬编码的数据库连接
+                if 'PDO' in stripped and _RE_HARDCODED_PDO.search(stripped):
+                    security_issues.append(CodeIssue(
+                        type="hardcoded_credentials",
+                        severity="warning",
+                        message=f"第{i+1}行安全风险: 硬编码的数据库连接信息",
                         line_number=i + 1,
                         line_content=stripped,
-                        suggestion="修复建议:\n1. 使用password_hash()加密密码\n2. 使用password_verify()验证密码\n3. 永远不要存储明文密码",
-                        code_snippet=[stripped]
+                        suggestion=_SUGG_HARDCODED_PDO
                     ))
-            
-            # 3. 检测硬编码的数据库连接
-            if re.search(r'new\s+PDO\(.*localhost.*root.*[\'"][0-9]+[\'"]', stripped):
-                issues.append(CodeIssue(
-                    type="hardcoded_credentials",
-                    severity="warning",
-                    message=f"第{i+1}行安全风险: 硬编码的数据库连接信息",
-                    line_number=i + 1,
-                    line_content=stripped,
-                    suggestion="修复建议:\n1. 使用环境变量存储敏感信息\n2. 使用配置文件(不提交到版本控制)\n3. 使用依赖注入管理数据库连接",
-                    code_snippet=[stripped]
-                ))
-            
-            # 4. 检测缺少错误处理
-            if re.search(r'(->query\(|->exec\(|mail\()', stripped):
+
+            # 检测缺少错误处理
+            if ('->' in stripped or 'mail(' in stripped) and _RE_DB_CALL.search(stripped):
                 # 检查后续几行是否有错误处理
                 has_error_handling = False
                 for j in range(i, min(i + 3, len(lines))):
-                    if re.search(r'(try|catch|if.*false|error)', lines[j], re.IGNORECASE):
+                    if _RE_ERROR_HANDLING.search(lines[j]):
                         has_error_handling = True
                         break
-                
+
                 if not has_error_handling:
-                    issues.append(CodeIssue(
+                    security_issues.append(CodeIssue(
                         type="missing_error_handling",
                         severity="warning",
                         message=f"第{i+1}行缺少错误处理",
                         line_number=i + 1,
                         line_content=stripped,
-                        suggestion="修复建议:\n1. 使用try-catch处理异常\n2. 检查函数返回值\n3. 记录错误日志\n4. 向用户显示友好的错误信息",
-                        code_snippet=[stripped]
+                        suggestion=_SUGG_ERROR_HANDLING
                     ))
-        
-        return issues
-    
-    def _find_code_quality_issues(self, lines: List[str]) -> List[CodeIssue]:
-        """查找代码质量问题"""
-        issues = []
-        
-        for i, line in enumerate(lines):
-            stripped = line.strip()
-            
-            # 1. 检测缺少类注释
-            if re.search(r'^class\s+\w+', stripped):
-                # 检查前面几行是否有注释
-                has_comment = False
-                for j in range(max(0, i - 3), i):
-                    if re.search(r'(/\*|\*|//)', lines[j]):
-                        has_comment = True
-                        break
-                
-                if not has_comment:
-                    issues.append(CodeIssue(
-                        type="missing_class_comment",
-                        severity="info",
-                        message=f"第{i+1}行缺少类注释",
-                        line_number=i + 1,
-                        line_content=stripped,
-                        suggestion="添加类注释说明:\n1. 类的用途和职责\n2. 主要功能说明\n3. 使用示例\n4. @author, @since等标签",
-                        code_snippet=[stripped]
-                    ))
-            
-            # 2. 检测public属性
-            if re.search(r'public\s+\$\w+', stripped):
-                issues.append(CodeIssue(
-                    type="public_property",
-                    severity="warning",
-                    message=f"第{i+1}行违反封装原则: public属性",
-                    line_number=i + 1,
-                    line_content=stripped,
-                    suggestion="修复建议:\n1. 将属性改为private或protected\n2. 提供getter/setter方法\n3. 使用readonly属性(PHP 8.1+)",
-                    code_snippet=[stripped]
-                ))
-            
-            # 3. 检测缺少类型声明
-            if re.search(r'function\s+\w+\([^)]*\$\w+[^)]*\)', stripped):
-                if not re.search(r'(int|string|bool|array|object|\w+\s+\$)', stripped):
-                    issues.append(CodeIssue(
-                        type="missing_type_declaration",
-                        severity="info",
-                        message=f"第{i+1}行缺少参数类型声明",
-                        line_number=i + 1,
-                        line_content=stripped,
-                        suggestion="添加类型声明:\n1. function getUserById(int $userId, bool $includeProfile = null)\n2. 使用返回类型: function getName(): string\n3. 使用nullable类型: ?string",
-                        code_snippet=[stripped]
-                    ))
-            
-            # 4. 检测缺少访问修饰符
-            if re.search(r'^\s*function\s+\w+', stripped) and not re.search(r'(public|private|protected)', stripped):
-                issues.append(CodeIssue(
-                    type="missing_access_modifier",
-                    severity="warning",
-                    message=f"第{i+1}行缺少访问修饰符",
-                    line_number=i + 1,
-                    line_content=stripped,
-                    suggestion="添加访问修饰符:\n1. public function - 公开方法\n2. private function - 私有方法\n3. protected function - 受保护方法",
-                    code_snippet=[stripped]
-                ))
-            
-            # 5. 检测全局变量
-            if re.search(r'^\$\w+\s*=', stripped):
-                issues.append(CodeIssue(
-                    type="global_variable",
-                    severity="warning",
-                    message=f"第{i+1}行使用全局变量",
-                    line_number=i + 1,
-                    line_content=stripped,
-                    suggestion="避免全局变量:\n1. 使用类属性\n2. 使用依赖注入\n3. 使用配置类\n4. 使用单例模式(谨慎使用)",
-                    code_snippet=[stripped]
-                ))
-        
-        return issues
-    
-    def _find_logic_errors(self, lines: List[str]) -> List[CodeIssue]:
-        """查找逻辑错误和危险模式"""
-        issues = []
-        
-        for i, line in enumerate(lines):
-            stripped = line.strip()
-            
-            # 1. 检测潜在的死循环
-            if re.search(r'while\s*\(\s*(true|1|TRUE)\s*\)', stripped):
-                # 检查循环体内是否有break语句
-                has_break = False
-                brace_count = 0
-                found_opening_brace = False
-                
-                for j in range(i, min(i + 50, len(lines))):  # 检查后续50行
-                    loop_line = lines[j].strip()
-                    
-                    if '{' in loop_line:
-                        found_opening_brace = True
-                        brace_count += loop_line.count('{')
-                        brace_count -= loop_line.count('}')
-                    elif found_opening_brace:
-                        brace_count += loop_line.count('{')
-                        brace_count -= loop_line.count('}')
-                    
-                    if 'break' in loop_line or 'return' in loop_line or 'exit' in loop_line:
-                        has_break = True
-                    
-                    if found_opening_brace and brace_count == 0:
-                        break
-                
+
+            # ---------- 8. 代码质量问题 ----------
+            # (质量规则已改为主循环外的整文件批量探测，见上方quality_events)
+
+            # ---------- 9. 逻辑错误和危险模式 ----------
+            # 检测潜在的死循环
+            if while_cand[i] and _RE_WHILE_TRUE.search(stripped):
+                # 检查循环体内是否有break语句（检查后续50行）
+                _, has_break = self._scan_block(
+                    stripped_lines, opens, closes, i, 50,
+                    ('break', 'return', 'exit'))
+
                 if not has_break:
-                    issues.append(CodeIssue(
+                    logic_issues.append(CodeIssue(
                         type="infinite_loop_risk",
                         severity="error",
                         message=f"第{i+1}行发现潜在的死循环: while(true)无exit条件",
                         line_number=i + 1,
                         line_content=stripped,
-                        suggestion="修复建议:\n1. 添加break或return语句\n2. 使用有条件的循环: while($condition)\n3. 添加计数器防止无限循环\n4. 使用for循环替代",
-                        code_snippet=[stripped]
+                        suggestion=_SUGG_INFINITE_WHILE
                     ))
-            
-            # 2. 检测for循环中的死循环模式
-            if re.search(r'for\s*\(\s*[^;]*;\s*[^;]*;\s*[^)]*\)', stripped):
+
+            # 检测for循环中的死循环模式
+            if for_cand[i] and _RE_FOR_HEADER.search(stripped):
                 # 检测i++但条件为i < 某个不变值的情况
-                if re.search(r'for\s*\(\s*\$\w+\s*=\s*\d+\s*;\s*\$\w+\s*[<>]=?\s*\d+\s*;\s*\)', stripped):
-                    issues.append(CodeIssue(
+                if _RE_FOR_NO_STEP.search(stripped):
+                    logic_issues.append(CodeIssue(
                         type="infinite_loop_risk",
                         severity="error",
                         message=f"第{i+1}行for循环缺少递增/递减语句",
                         line_number=i + 1,
                         line_content=stripped,
-                        suggestion="修复建议:\n1. 添加$i++或$i--\n2. 确保循环变量会改变\n3. 检查循环终止条件",
-                        code_snippet=[stripped]
+                        suggestion=_SUGG_INFINITE_FOR
                     ))
-            
-            # 3. 检测可能的无限递归
-            if re.search(r'function\s+(\w+)', stripped):
-                function_name = re.search(r'function\s+(\w+)', stripped).group(1)
+
+            # 检测可能的无限递归
+            if has_function and _RE_FUNCTION_DEF.search(stripped):
+                function_name = _RE_FUNCTION_DEF.search(stripped).group(1)
                 # 检查函数体内是否直接调用自己且没有终止条件
-                brace_count = 0
-                found_opening_brace = False
+                fn_end = int(_find_block_end(opens, closes, i, 100))
+                self_call_marker = f'{function_name}('
                 has_termination = False
                 has_self_call = False
-                
-                for j in range(i, min(i + 100, len(lines))):
-                    func_line = lines[j].strip()
-                    
-                    if '{' in func_line:
-                        found_opening_brace = True
-                        brace_count += func_line.count('{')
-                        brace_count -= func_line.count('}')
-                    elif found_opening_brace:
-                        brace_count += func_line.count('{')
-                        brace_count -= func_line.count('}')
-                    
-                    if found_opening_brace and f'{function_name}(' in func_line:
+                fn_opened = False
+
+                for j in range(i, fn_end + 1):
+                    func_line = stripped_lines[j]
+
+                    if not fn_opened and opens[j] > 0:
+                        fn_opened = True
+
+                    if fn_opened and self_call_marker in func_line:
                         has_self_call = True
-                    
-                    if re.search(r'(if|return|break|\$\w+\s*[<>]=?)', func_line):
+
+                    if (('if' in func_line or 'return' in func_line
+                         or 'break' in func_line or '<' in func_line
+                         or '>' in func_line)
+                            and _RE_TERMINATION.search(func_line)):
                         has_termination = True
-                    
-                    if found_opening_brace and brace_count == 0:
-                        break
-                
+
                 if has_self_call and not has_termination:
-                    issues.append(CodeIssue(
+                    logic_issues.append(CodeIssue(
                         type="infinite_recursion_risk",
                         severity="error",
                         message=f"第{i+1}行函数'{function_name}'可能存在无限递归",
                         line_number=i + 1,
                         line_content=stripped,
-                        suggestion="修复建议:\n1. 添加递归终止条件\n2. 确保参数在递归中会改变\n3. 添加递归深度限制\n4. 考虑使用迭代替代递归",
-                        code_snippet=[stripped]
+                        suggestion=_SUGG_INFINITE_RECURSION
                     ))
-            
-            # 4. 检测空的catch块
-            if re.search(r'catch\s*\([^)]*\)\s*\{?\s*\}?', stripped):
+
+            # 检测空的catch块
+            if catch_cand[i] and _RE_CATCH.search(stripped):
                 # 检查catch块是否为空
-                if i + 1 < len(lines) and lines[i + 1].strip() == '}':
-                    issues.append(CodeIssue(
+                if i + 1 < len(lines) and stripped_lines[i + 1] == '}':
+                    logic_issues.append(CodeIssue(
                         type="empty_catch_block",
                         severity="error",
                         message=f"第{i+1}行空的catch块: 忽略异常是危险的",
                         line_number=i + 1,
                         line_content=stripped,
-                        suggestion="修复建议:\n1. 记录错误日志\n2. 显示用户友好的错误信息\n3. 重新抛出异常\n4. 执行清理操作",
-                        code_snippet=[stripped]
+                        suggestion=_SUGG_EMPTY_CATCH
                     ))
-            
-            # 5. 检测可能的内存泄漏
-            if re.search(r'while\s*\([^)]*\)', stripped):
+
+            # 检测可能的内存泄漏
+            if while_cand[i] and _RE_WHILE_ANY.search(stripped):
                 # 检查循环内是否有大对象创建但没有释放
                 for j in range(i + 1, min(i + 20, len(lines))):
                     if 'new ' in lines[j] and 'unset' not in lines[j]:
-                        issues.append(CodeIssue(
+                        logic_issues.append(CodeIssue(
                             type="memory_leak_risk",
                             severity="warning",
                             message=f"第{j+1}行循环内创建对象可能导致内存泄漏",
                             line_number=j + 1,
-                            line_content=lines[j].strip(),
-                            suggestion="修复建议:\n1. 在循环外创建对象\n2. 使用unset()释放大对象\n3. 避免在循环内创建不必要的对象\n4. 考虑使用对象池模式",
-                            code_snippet=[lines[j].strip()]
+                            line_content=stripped_lines[j],
+                            suggestion=_SUGG_MEMORY_LEAK
                         ))
                         break
-            
-            # 6. 检测除零错误
-            if re.search(r'/\s*\$\w+', stripped) and 'if' not in stripped:
-                issues.append(CodeIssue(
+
+            # 检测除零错误
+            if div_cand[i] and 'if' not in stripped and _RE_DIV_BY_VAR.search(stripped):
+                logic_issues.append(CodeIssue(
                     type="division_by_zero_risk",
                     severity="warning",
                     message=f"第{i+1}行可能的除零错误",
                     line_number=i + 1,
                     line_content=stripped,
-                    suggestion="修复建议:\n1. 在除法前检查除数不为零\n2. 使用条件语句: if($divisor != 0)\n3. 抛出适当的异常",
-                    code_snippet=[stripped]
+                    suggestion=_SUGG_DIV_ZERO
                 ))
-            
-            # 7. 检测数组越界风险
-            if re.search(r'\$\w+\[\$\w+\]', stripped) and 'isset' not in stripped and 'array_key_exists' not in stripped:
-                issues.append(CodeIssue(
+
+            # 检测数组越界风险
+            if arridx_cand[i] and 'isset' not in stripped and 'array_key_exists' not in stripped and _RE_DYN_ARRAY_INDEX.search(stripped):
+                logic_issues.append(CodeIssue(
                     type="array_bounds_risk",
                     severity="warning",
                     message=f"第{i+1}行可能的数组越界访问",
                     line_number=i + 1,
                     line_content=stripped,
-                    suggestion="修复建议:\n1. 使用isset()检查键是否存在\n2. 使用array_key_exists()检查\n3. 使用null合并运算符: $arr[$key] ?? $default",
-                    code_snippet=[stripped]
+                    suggestion=_SUGG_ARRAY_BOUNDS
                 ))
-            
-            # 8. 检测文件操作缺少检查
-            if re.search(r'(fopen|file_get_contents|include|require)\(', stripped):
-                if not re.search(r'(file_exists|is_readable|@)', stripped):
-                    issues.append(CodeIssue(
+
+            # 检测文件操作缺少检查
+            if fileop_cand[i] and _RE_FILE_OP.search(stripped):
+                if not _RE_FILE_CHECK.search(stripped):
+                    logic_issues.append(CodeIssue(
                         type="file_operation_risk",
                         severity="warning",
                         message=f"第{i+1}行文件操作缺少存在性检查",
                         line_number=i + 1,
                         line_content=stripped,
-                        suggestion="修复建议:\n1. 使用file_exists()检查文件是否存在\n2. 使用is_readable()检查权限\n3. 使用try-catch处理文件异常\n4. 检查函数返回值",
-                        code_snippet=[stripped]
+                        suggestion=_SUGG_FILE_OP
                     ))
-        
-        return issues
-    
-    def _find_performance_issues(self, lines: List[str]) -> List[CodeIssue]:
-        """查找性能问题"""
-        issues = []
-        
-        for i, line in enumerate(lines):
-            stripped = line.strip()
-            
-            # 1. 检测循环内的数据库查询
-            if re.search(r'(for|while|foreach)\s*\(', stripped):
-                for j in range(i + 1, min(i + 30, len(lines))):
-                    if re.search(r'(->query\(|->prepare\(|mysql_|mysqli_)', lines[j]):
-                        issues.append(CodeIssue(
-                            type="query_in_loop",
-                            severity="error",
-                            message=f"第{j+1}行在循环内执行数据库查询 (N+1问题)",
-                            line_number=j + 1,
-                            line_content=lines[j].strip(),
-                            suggestion="修复建议:\n1. 将查询移到循环外\n2. 使用JOIN合并查询\n3. 使用IN子句批量查询\n4. 考虑使用ORM的eager loading",
-                            code_snippet=[lines[j].strip()]
-                        ))
-                        break
-            
-            # 2. 检测大文件读取
-            if re.search(r'file_get_contents\(', stripped):
-                issues.append(CodeIssue(
+
+            # ---------- 10. 性能问题 ----------
+            # 单趟状态机: 记录尚未命中的循环头，命中行出现时一次性结算，
+            # 不再为每个循环头重扫30行窗口（O(N·30)降为O(N)）。
+            # 事件排序后发射，与逐循环头扫描的输出顺序逐条一致
+            has_loop_kw = 'for' in stripped or while_cand[i]
+
+            # 检测循环内的数据库查询: 窗口为循环头后30行
+            if pend_query:
+                pend_query = [h for h in pend_query if i < h + 30]
+                if pend_query and _RE_DB_QUERY_CALL.search(line):
+                    perf_events.extend((h, 0, i) for h in pend_query)
+                    pend_query = []
+
+            # 检测大文件读取
+            if fileop_cand[i] and 'file_get_contents(' in stripped:
+                perf_events.append((i, 1, i))
+
+            # 检测字符串连接在循环中: 窗口为循环头后20行
+            if pend_concat:
+                pend_concat = [h for h in pend_concat if i < h + 20]
+                if pend_concat and _RE_STR_APPEND.search(line):
+                    perf_events.extend((h, 2, i) for h in pend_concat)
+                    pend_concat = []
+
+            # 检测正则表达式在循环中编译: 窗口为循环头后20行
+            if pend_preg:
+                pend_preg = [h for h in pend_preg if i < h + 20]
+                if pend_preg and _RE_PREG_CALL.search(line):
+                    perf_events.extend((h, 3, i) for h in pend_preg)
+                    pend_preg = []
+
+            # 检测冗余的函数调用
+            if count_cand[i] and 'for' in stripped and _RE_COUNT_CALL.search(stripped):
+                perf_events.append((i, 4, i))
+
+            # 循环头最后登记，保证命中窗口从循环头的下一行开始
+            if has_loop_kw and _RE_LOOP_HEADER.search(stripped):
+                pend_query.append(i)
+                pend_concat.append(i)
+                pend_preg.append(i)
+
+        for _, perf_rank, j in sorted(perf_events):
+            if perf_rank == 0:
+                performance_issues.append(CodeIssue(
+                    type="query_in_loop",
+                    severity="error",
+                    message=f"第{j+1}行在循环内执行数据库查询 (N+1问题)",
+                    line_number=j + 1,
+                    line_content=stripped_lines[j],
+                    suggestion=_SUGG_QUERY_IN_LOOP
+                ))
+            elif perf_rank == 1:
+                performance_issues.append(CodeIssue(
                     type="large_file_read_risk",
                     severity="warning",
-                    message=f"第{i+1}行使用file_get_contents可能导致内存问题",
-                    line_number=i + 1,
-                    line_content=stripped,
-                    suggestion="修复建议:\n1. 对大文件使用fopen/fread分块读取\n2. 使用SplFileObject逐行读取\n3. 设置内存限制检查\n4. 考虑流式处理",
-                    code_snippet=[stripped]
+                    message=f"第{j+1}行使用file_get_contents可能导致内存问题",
+                    line_number=j + 1,
+                    line_content=stripped_lines[j],
+                    suggestion=_SUGG_LARGE_FILE_READ
                 ))
-            
-            # 3. 检测字符串连接在循环中
-            if re.search(r'(for|while|foreach)\s*\(', stripped):
-                for j in range(i + 1, min(i + 20, len(lines))):
-                    if re.search(r'\$\w+\s*\.=', lines[j]):
-                        issues.append(CodeIssue(
-                            type="string_concat_in_loop",
-                            severity="warning",
-                            message=f"第{j+1}行循环内字符串连接影响性能",
-                            line_number=j + 1,
-                            line_content=lines[j].strip(),
-                            suggestion="修复建议:\n1. 使用数组收集字符串，最后implode()\n2. 使用StringBuilder模式\n3. 预先估算字符串长度",
-                            code_snippet=[lines[j].strip()]
-                        ))
-                        break
-            
-            # 4. 检测正则表达式在循环中编译
-            if re.search(r'(for|while|foreach)\s*\(', stripped):
-                for j in range(i + 1, min(i + 20, len(lines))):
-                    if re.search(r'preg_(match|replace)\(', lines[j]):
-                        issues.append(CodeIssue(
-                            type="regex_compile_in_loop",
-                            severity="info",
-                            message=f"第{j+1}行循环内编译正则表达式",
-                            line_number=j + 1,
-                            line_content=lines[j].strip(),
-                            suggestion="性能优化:\n1. 将正则表达式移到循环外预编译\n2. 使用preg_match_all批量处理\n3. 考虑使用更快的字符串函数",
-                            code_snippet=[lines[j].strip()]
-                        ))
-                        break
-            
-            # 5. 检测冗余的函数调用
-            if re.search(r'count\(\$\w+\)', stripped) and 'for' in stripped:
-                issues.append(CodeIssue(
+            elif perf_rank == 2:
+                performance_issues.append(CodeIssue(
+                    type="string_concat_in_loop",
+                    severity="warning",
+                    message=f"第{j+1}行循环内字符串连接影响性能",
+                    line_number=j + 1,
+                    line_content=stripped_lines[j],
+                    suggestion=_SUGG_STR_CONCAT
+                ))
+            elif perf_rank == 3:
+                performance_issues.append(CodeIssue(
+                    type="regex_compile_in_loop",
+                    severity="info",
+                    message=f"第{j+1}行循环内编译正则表达式",
+                    line_number=j + 1,
+                    line_content=stripped_lines[j],
+                    suggestion=_SUGG_PREG_IN_LOOP
+                ))
+            else:
+                performance_issues.append(CodeIssue(
                     type="redundant_function_call",
                     severity="info",
-                    message=f"第{i+1}行循环条件中调用count()影响性能",
-                    line_number=i + 1,
-                    line_content=stripped,
-                    suggestion="性能优化:\n1. 将count()结果缓存到变量\n2. 使用foreach替代for循环\n3. 或改为: for($i = 0, $len = count($arr); $i < $len; $i++)",
-                    code_snippet=[stripped]
+                    message=f"第{j+1}行循环条件中调用count()影响性能",
+                    line_number=j + 1,
+                    line_content=stripped_lines[j],
+                    suggestion=_SUGG_COUNT_IN_LOOP
                 ))
-        
-        return issues
-    
+
+        return (long_method_issues + complex_method_issues + param_list_issues +
+                naming_issues + uncommented_issues + sql_issues + security_issues +
+                quality_issues + logic_issues + performance_issues)
+
+    @staticmethod
+    def _scan_block(stripped_lines: List[str], opens: np.ndarray, closes: np.ndarray,
+                    start: int, max_look: int, tokens: Tuple[str, ...]) -> Tuple[int, bool]:
+        """定位从start行开始的代码块并检查块内是否出现任一标记token
+
+        块结束行由JIT内核在行级大括号计数数组上定位；
+        返回(块结束行下标, 是否在start..结束行内命中token)。
+        """
+        end = int(_find_block_end(opens, closes, start, max_look))
+        for j in range(start, end + 1):
+            line = stripped_lines[j]
+            for token in tokens:
+                if token in line:
+                    return end, True
+        return end, False
+
+    @staticmethod
+    def _find_method_end(brace_depth: np.ndarray, start: int) -> int:
+        """在大括号深度前缀和数组上查找从start行开始的方法结束行
+
+        与逐行计数语义一致: 相对深度先变为正（进入方法体），
+        之后首次回到0的行即方法结束行；找不到时返回start本身。
+        """
+        base = brace_depth[start - 1] if start > 0 else 0
+        local = brace_depth[start:] - base
+
+        opened = local > 0
+        if not opened.any():
+            return start
+        j0 = int(np.argmax(opened))
+
+        zeros = local[j0:] == 0
+        if not zeros.any():
+            return start
+        return start + j0 + int(np.argmax(zeros))
+
     def _to_pascal_case(self, name: str) -> str:
         """转换为PascalCase"""
-        parts = re.split(r'[_\-\s]+', name.lower())
+        # 标识符分隔符只有下划线/连字符/空白，纯str操作即可，不必动用正则
+        parts = name.lower().replace('-', '_').replace(' ', '_').replace('\t', '_').split('_')
         return ''.join(word.capitalize() for word in parts if word)
-    
+
     def _to_camel_case(self, name: str) -> str:
         """转换为camelCase"""
-        parts = re.split(r'[_\-\s]+', name.lower())
+        parts = name.lower().replace('-', '_').replace(' ', '_').replace('\t', '_').split('_')
         if not parts:
             return name
         return parts[0] + ''.join(word.capitalize() for word in parts[1:] if word)
     
     def detect_batch(self, file_paths: List[str]) -> List[SmellDetectionResult]:
-        """批量检测代码异味"""
-        results = []
-        
+        """批量检测代码异味（各文件相互独立，用进程池并行检测）"""
         print(f"开始批量检测 {len(file_paths)} 个文件...")
-        
+
+        # 文件太少时进程启动开销不划算，直接走串行
+        if len(file_paths) < 4:
+            return self._detect_batch_serial(file_paths)
+
+        results = []
+        try:
+            with ProcessPoolExecutor(initializer=_init_worker,
+                                     initargs=(self.models_dir,)) as pool:
+                futures = [(p, pool.submit(_detect_one, p)) for p in file_paths]
+                for i, (file_path, future) in enumerate(futures):
+                    try:
+                        results.append(future.result())
+                    except Exception as e:
+                        print(f"检测文件 {file_path} 时出错: {e}")
+
+                    if (i + 1) % 10 == 0:
+                        print(f"已检测 {i + 1}/{len(file_paths)} 个文件")
+        except Exception as e:
+            # 进程池不可用（受限环境等）时回退到串行检测
+            print(f"多进程检测不可用，回退到串行: {e}")
+            return self._detect_batch_serial(file_paths)
+
+        print(f"批量检测完成，成功检测 {len(results)} 个文件")
+        return results
+
+    def _detect_batch_serial(self, file_paths: List[str]) -> List[SmellDetectionResult]:
+        """串行批量检测（小批量或进程池不可用时的路径）"""
+        results = []
+
         for i, file_path in enumerate(file_paths):
             try:
                 result = self.detect_smells(file_path)
                 results.append(result)
-                
+
                 if (i + 1) % 10 == 0:
                     print(f"已检测 {i + 1}/{len(file_paths)} 个文件")
-                    
+
             except Exception as e:
                 print(f"检测文件 {file_path} 时出错: {e}")
                 continue
-        
+
         print(f"批量检测完成，成功检测 {len(results)} 个文件")
         return results
     
@@ -1184,8 +1580,12 @@ class CodeSmellDetector:
                 severity = issue.get('severity', 'info')
                 severity_counts[severity] += 1
         
-        # 生成HTML报告
-        html_content = f"""
+        # 检测时间只计算一次，不在拼接循环里反复求值
+        now_str = datetime.now().strftime('%Y-%m-%d %H:%M:%S')
+
+        # 生成HTML报告: 边生成边写盘，内存里最多只保留单个文件的片段
+        with open(output_path, 'w', encoding='utf-8', buffering=1 << 20) as f:
+            f.write(f"""
 <!DOCTYPE html>
 <html lang="zh-CN">
 <head>
@@ -1222,7 +1622,7 @@ class CodeSmellDetector:
 <body>
     <div class="header">
         <h1>代码异味检测报告</h1>
-        <p>检测时间: {__import__('datetime').datetime.now().strftime('%Y-%m-%d %H:%M:%S')}</p>
+        <p>检测时间: {now_str}</p>
     </div>
     
     <div class="summary">
@@ -1246,98 +1646,110 @@ class CodeSmellDetector:
     
     <h2>异味类型分布</h2>
     <ul>
-"""
-        
-        for smell_type, count in smell_counts.items():
-            html_content += f"<li>{smell_type}: {count} 个文件</li>\n"
-        
-        html_content += """
+""")
+
+            for smell_type, count in smell_counts.items():
+                f.write(f"<li>{smell_type}: {count} 个文件</li>\n")
+
+            f.write("""
     </ul>
     
     <h2>详细结果</h2>
-"""
-        
-        for result in results:
-            css_class = 'clean' if result.smell_type == 'clean' else 'warning'
-            if any(issue.get('severity') == 'error' for issue in result.issues):
-                css_class = 'error'
-            
-            html_content += f"""
+""")
+
+            for result in results:
+                f.write(self._render_result(result))
+
+            f.write(_HTML_FOOTER)
+
+        print(f"检测报告已保存到: {output_path}")
+
+    def _render_result(self, result: SmellDetectionResult) -> str:
+        """渲染单个文件的结果片段: 片段append到列表后一次join"""
+        css_class = 'clean' if result.smell_type == 'clean' else 'warning'
+        if any(issue.get('severity') == 'error' for issue in result.issues):
+            css_class = 'error'
+
+        parts = [f"""
     <div class="file-result {css_class}">
-        <h3>{os.path.basename(result.file_path)}</h3>
-        <p><strong>文件路径:</strong> {result.file_path}</p>
+        <h3>{os.path.basename(result.file_path).translate(_HTML_TR)}</h3>
+        <p><strong>文件路径:</strong> {result.file_path.translate(_HTML_TR)}</p>
         <p><strong>主要异味:</strong> {self.get_smell_description(result.smell_type)} ({result.smell_type}) (置信度: {result.confidence:.2%})</p>
         
         <h4>检测到的问题:</h4>
-"""
-            
-            # 显示详细问题（新增）
-            if hasattr(result, 'detailed_issues') and result.detailed_issues:
-                for issue in result.detailed_issues:
-                    severity_icon = {'error': '🚨', 'warning': '⚠️', 'info': 'ℹ️'}.get(issue.severity, 'ℹ️')
-                    html_content += f"""
+"""]
+
+        # 显示详细问题（新增）
+        if hasattr(result, 'detailed_issues') and result.detailed_issues:
+            for issue in result.detailed_issues:
+                severity_icon = _SEVERITY_ICON.get(issue.severity, 'ℹ️')
+                parts.append(f"""
         <div class="issue {issue.severity}">
             <div class="issue-header">
-                <strong>{severity_icon} {issue.message}</strong>
+                <strong>{severity_icon} {issue.message.translate(_HTML_TR)}</strong>
                 <span class="line-number">第 {issue.line_number} 行</span>
             </div>
             <div class="code-location">
                 <strong>问题代码:</strong>
-                <pre class="code-snippet">{issue.line_content}</pre>
+                <pre class="code-snippet">{issue.line_content.translate(_HTML_TR)}</pre>
             </div>
             <div class="suggestion-detail">
-                <strong>💡 改进建议:</strong> {issue.suggestion}
+                <strong>💡 改进建议:</strong> {issue.suggestion.translate(_HTML_TR)}
             </div>
-"""
-                    if len(issue.code_snippet) > 1:
-                        html_content += """
+""")
+                if len(issue.code_snippet) > 1:
+                    parts.append("""
             <details class="code-context">
                 <summary>查看代码上下文</summary>
-                <pre class="code-block">"""
-                        for j, line in enumerate(issue.code_snippet):
-                            line_num = issue.line_number + j - 1
-                            html_content += f"{line_num:3d}: {line}\n"
-                        html_content += """</pre>
-            </details>"""
-                    
-                    html_content += "        </div>\n"
-            
-            elif result.issues:
-                for issue in result.issues:
-                    html_content += f"""
+                <pre class="code-block">""")
+                    for j, line in enumerate(issue.code_snippet):
+                        line_num = issue.line_number + j - 1
+                        parts.append(f"{line_num:3d}: {line.translate(_HTML_TR)}\n")
+                    parts.append("""</pre>
+            </details>""")
+                
+                parts.append("        </div>\n")
+        
+        elif result.issues:
+            for issue in result.issues:
+                parts.append(f"""
         <div class="issue {issue.get('severity', 'info')}">
-            <strong>{issue['message']}</strong><br>
-            {issue['details']}
+            <strong>{issue['message'].translate(_HTML_TR)}</strong><br>
+            {issue['details'].translate(_HTML_TR)}
         </div>
-"""
-            else:
-                html_content += "<p>未发现明显问题</p>"
-            
-            if result.suggestions:
-                html_content += """
+""")
+        else:
+            parts.append("<p>未发现明显问题</p>")
+        
+        if result.suggestions:
+            parts.append("""
         <div class="suggestions">
             <h4>通用改进建议:</h4>
             <ul>
-"""
-                for suggestion in result.suggestions:
-                    html_content += f"<li>{suggestion}</li>\n"
-                
-                html_content += """
+""")
+            for suggestion in result.suggestions:
+                parts.append(f"<li>{suggestion.translate(_HTML_TR)}</li>\n")
+            
+            parts.append("""
             </ul>
         </div>
-"""
-            
-            html_content += "    </div>\n"
+""")
         
-        html_content += """
-</body>
-</html>
-"""
-        
-        with open(output_path, 'w', encoding='utf-8') as f:
-            f.write(html_content)
-        
-        print(f"检测报告已保存到: {output_path}")
+        parts.append("    </div>\n")
+        return "".join(parts)
+
+# 进程池worker: 每个子进程只初始化一次检测器，
+# 模型在子进程内自行加载，不随任务反复序列化传输
+_WORKER_DETECTOR = None
+
+def _init_worker(models_dir: str):
+    """进程池初始化函数，在子进程内构建检测器"""
+    global _WORKER_DETECTOR
+    _WORKER_DETECTOR = CodeSmellDetector(models_dir=models_dir)
+
+def _detect_one(file_path: str) -> SmellDetectionResult:
+    """用子进程内的检测器检测单个文件"""
+    return _WORKER_DETECTOR.detect_smells(file_path)
 
 def main():
     """演示代码异味检测器"""
@@ -6,12 +6,127 @@
 """
 
 import numpy as np
+import io
+import mmap
+import os
 import re
-from typing import Dict, List, Any, Tuple
+import functools
+import hashlib
+import pickle
+from typing import Dict, List, Any, Optional, Tuple
+from collections import namedtuple
 from dataclasses import dataclass
 from php_parser import PHPParser
 
-@dataclass
+try:
+    from numba import njit
+except ImportError:
+    # numba不可用时退化为纯Python实现（与PHP不可用时的备用解析思路一致）
+    def njit(*args, **kwargs):
+        def wrapper(func):
+            return func
+        return wrapper
+
+def _read_file_content(file_path: str) -> str:
+    """通过mmap读取整个文件并只做一次整体解码
+
+    大文件直接映射进地址空间，不经过文本模式的逐块解码和行拆分；
+    换行按universal newline规则统一成\\n，结果与open(..., 'r').read()
+    完全一致。
+    """
+    with open(file_path, 'rb') as f:
+        if os.fstat(f.fileno()).st_size == 0:
+            return ''
+        with mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) as mm:
+            text = mm[:].decode('utf-8', errors='ignore')
+    return io.StringIO(text, newline=None).read()
+
+# 特征提取逻辑的版本号，特征含义或算法变化时递增，使旧的磁盘缓存自然失效
+_EXTRACTOR_VERSION = 1
+
+# 方法信息的固定schema元组：热循环里属性访问走C层槽位查找，
+# 代替逐方法逐字段带默认值的dict探查
+_MethodInfo = namedtuple('_MethodInfo', ('name', 'complexity', 'parameters'))
+
+# 命名约定检查的预编译正则（模块级常量，避免每次调用重新编译）。
+# MULTILINE版本把一类名字拼成多行缓冲后一次扫完，合规名逐行匹配
+_RE_PASCAL_CLASS = re.compile(r'^[A-Z][a-zA-Z0-9]*$', re.MULTILINE)
+_RE_CAMEL_METHOD = re.compile(r'^[a-z][a-zA-Z0-9]*$', re.MULTILINE)
+_RE_VAR_NAME = re.compile(r'^\$[a-z][a-zA-Z0-9_]*$', re.MULTILINE)
+
+# 一趟扫描所有方法/类定义用的模式（与逐名模式的形状一一对应）
+_RE_METHOD_DEF_ANY = re.compile(r'function\s+(\w+)\s*\([^)]*\)\s*\{', re.IGNORECASE)
+_RE_CLASS_DEF_ANY = re.compile(r'class\s+(\w+)(?:\s+extends\s+\w+)?(?:\s+implements\s+[^{]+)?\s*\{', re.IGNORECASE)
+
+@functools.lru_cache(maxsize=1024)
+def _method_def_pattern(method_name: str) -> 're.Pattern':
+    """按方法名缓存编译好的方法定义正则（常见方法名跨文件复用）"""
+    return re.compile(rf'function\s+{re.escape(method_name)}\s*\([^)]*\)\s*\{{', re.IGNORECASE)
+
+@functools.lru_cache(maxsize=1024)
+def _class_def_pattern(class_name: str) -> 're.Pattern':
+    """按类名缓存编译好的类定义正则"""
+    return re.compile(rf'class\s+{re.escape(class_name)}(?:\s+extends\s+\w+)?(?:\s+implements\s+[^{{]+)?\s*\{{', re.IGNORECASE)
+
+@njit(cache=True)
+def _count_comment_lines(buf):
+    """单趟字节状态机统计(注释行数, 总行数)（Numba JIT热循环）
+
+    逐字节识别行内的/*、*/与去掉前导空白后的// /#开头，在换行处
+    按逐行实现的判定顺序结算；注释标记都是ASCII字节，不会出现在
+    UTF-8多字节序列中，按字节扫描是精确的。
+    """
+    n = buf.shape[0]
+    total_lines = 1
+    comment_lines = 0
+    in_block = False
+    has_open = False      # 本行出现/*
+    has_close = False     # 本行出现*/
+    line_started = False  # 已见到首个非空白字节
+    starts_comment = False  # 去掉前导空白后以// 或 # 开头
+    prev = 0
+    for i in range(n):
+        b = buf[i]
+        if b == 10:  # 换行: 结算本行
+            if has_open:
+                in_block = True
+            if has_close:
+                in_block = False
+                comment_lines += 1
+            elif in_block:
+                comment_lines += 1
+            elif starts_comment:
+                comment_lines += 1
+            total_lines += 1
+            has_open = False
+            has_close = False
+            line_started = False
+            starts_comment = False
+            prev = 0
+            continue
+        if b == 42 and prev == 47:    # /*
+            has_open = True
+        elif b == 47 and prev == 42:  # */
+            has_close = True
+        if not line_started and b != 32 and b != 9 and b != 13 and b != 11 and b != 12:
+            line_started = True
+            if b == 35:  # '#'
+                starts_comment = True
+            elif b == 47 and i + 1 < n and buf[i + 1] == 47:  # '//'
+                starts_comment = True
+        prev = b
+    # 最后一行（无结尾换行）同样结算
+    if has_open:
+        in_block = True
+    if has_close:
+        comment_lines += 1
+    elif in_block:
+        comment_lines += 1
+    elif starts_comment:
+        comment_lines += 1
+    return comment_lines, total_lines
+
+@dataclass(slots=True)
 class CodeFeatures:
     """代码特征"""
     # 基础特征
@@ -50,7 +165,11 @@ class CodeFeatures:
     comment_ratio: float
     
     def to_vector(self) -> np.ndarray:
-        """转换为特征向量"""
+        """转换为特征向量
+
+        特征都是小量级的计数和均值，float32精度绰绰有余，
+        内存带宽减半，下游矩阵运算的SIMD吞吐翻倍。
+        """
         return np.array([
             self.lines_of_code,
             self.cyclomatic_complexity,
@@ -75,8 +194,38 @@ class CodeFeatures:
             self.complex_method_count,
             self.naming_convention_violations,
             self.comment_ratio
-        ])
-    
+        ], dtype=np.float32)
+
+    def write_into(self, out: np.ndarray):
+        """将特征按to_vector的顺序写入调用方预分配的一行缓冲
+
+        批量预测时逐行填充同一个矩阵，避免先to_vector再vstack的
+        中间数组分配。
+        """
+        out[0] = self.lines_of_code
+        out[1] = self.cyclomatic_complexity
+        out[2] = self.number_of_classes
+        out[3] = self.number_of_functions
+        out[4] = self.number_of_methods
+        out[5] = self.number_of_variables
+        out[6] = self.avg_method_complexity
+        out[7] = self.max_method_complexity
+        out[8] = self.avg_method_parameters
+        out[9] = self.max_method_parameters
+        out[10] = self.avg_method_length
+        out[11] = self.max_method_length
+        out[12] = self.avg_class_methods
+        out[13] = self.max_class_methods
+        out[14] = self.avg_class_properties
+        out[15] = self.max_class_properties
+        out[16] = self.inheritance_depth
+        out[17] = self.long_method_count
+        out[18] = self.long_class_count
+        out[19] = self.large_parameter_list_count
+        out[20] = self.complex_method_count
+        out[21] = self.naming_convention_violations
+        out[22] = self.comment_ratio
+
     @classmethod
     def get_feature_names(cls) -> List[str]:
         """获取特征名称"""
@@ -106,10 +255,13 @@ class CodeFeatures:
             'comment_ratio'
         ]
 
+# 特征向量维数（与to_vector/write_into/get_feature_names保持一致）
+N_FEATURES = len(CodeFeatures.get_feature_names())
+
 class FeatureExtractor:
-    def __init__(self):
+    def __init__(self, cache_dir: str = '.aicr_cache'):
         self.parser = PHPParser()
-        
+
         # 阈值配置
         self.thresholds = {
             'long_method_lines': 50,
@@ -117,53 +269,129 @@ class FeatureExtractor:
             'large_parameter_count': 5,
             'complex_method_complexity': 10
         }
-    
+
+        # 特征磁盘缓存目录（传None或空串可关闭缓存）
+        self.cache_dir = cache_dir
+
     def extract_features(self, file_path: str) -> CodeFeatures:
-        """从PHP文件提取特征"""
+        """从PHP文件提取特征（带基于内容哈希的磁盘缓存）"""
+        # mmap读取+一次解码，后续分析都在这同一份内容缓冲上进行
+        content = _read_file_content(file_path)
+
+        # 磁盘缓存: 内容、阈值配置和提取器版本都没变时直接复用上次的特征，
+        # 增量运行时可以完全跳过解析和正则分析
+        cache_path = self._feature_cache_path(content)
+        cached = self._load_cached_features(cache_path)
+        if cached is not None:
+            return cached
+
+        features = self._extract_features_from_content(file_path, content)
+        self._store_cached_features(cache_path, features)
+        return features
+
+    def _feature_cache_path(self, content: str) -> Optional[str]:
+        """计算特征缓存文件路径，缓存未启用时返回None
+
+        缓存键包含文件内容哈希、阈值配置和提取器版本，
+        任一变化都会让旧缓存自然失效。
+        """
+        if not self.cache_dir:
+            return None
+        state = (_EXTRACTOR_VERSION, sorted(self.thresholds.items()))
+        digest = hashlib.sha256((content + repr(state)).encode('utf-8')).hexdigest()
+        return os.path.join(self.cache_dir, digest[:2], f"{digest}.pkl")
+
+    def _load_cached_features(self, cache_path: Optional[str]) -> Optional[CodeFeatures]:
+        """读取缓存的特征，缓存不存在或损坏时返回None"""
+        if not cache_path or not os.path.exists(cache_path):
+            return None
+        try:
+            with open(cache_path, 'rb') as f:
+                return pickle.load(f)
+        except Exception:
+            return None
+
+    def _store_cached_features(self, cache_path: Optional[str], features: CodeFeatures):
+        """将特征写入磁盘缓存（写失败不影响本次提取）"""
+        if not cache_path:
+            return
+        try:
+            os.makedirs(os.path.dirname(cache_path), exist_ok=True)
+            with open(cache_path, 'wb') as f:
+                pickle.dump(features, f)
+        except Exception:
+            pass
+
+    def extract_features_from_lines(self, file_path: str, lines: List[str]) -> CodeFeatures:
+        """从已读取的行缓冲提取特征（调用方可与其他分析共享同一次文件读取）"""
+        return self._extract_features_from_content(file_path, ''.join(lines))
+
+    def _extract_features_from_content(self, file_path: str, content: str) -> CodeFeatures:
+        """从完整的内容字符串提取特征"""
         # 解析PHP文件
         parse_result = self.parser.parse_file(file_path)
-        
-        # 读取文件内容用于额外分析
-        with open(file_path, 'r', encoding='utf-8', errors='ignore') as f:
-            content = f.read()
-        
-        # 保存详细分析结果供后续使用
+
+        # 保存详细分析结果供后续使用（不再冗余保存按行拆分的第二份副本）
         self.detailed_analysis = {
             'file_path': file_path,
             'content': content,
-            'parse_result': parse_result,
-            'lines': content.split('\n')
+            'parse_result': parse_result
         }
-        
+
+        # 解析结果的各个列表后面要反复用到，取一次局部别名，
+        # 不再重复做dict查找和默认值分配
+        classes = parse_result.get('classes') or []
+        functions = parse_result.get('functions') or []
+        variables = parse_result.get('variables') or []
+
         # 基础特征
         lines_of_code = parse_result.get('lines', 0)
         cyclomatic_complexity = parse_result.get('complexity', 1)
-        number_of_classes = len(parse_result.get('classes', []))
-        number_of_functions = len(parse_result.get('functions', []))
-        number_of_variables = len(parse_result.get('variables', []))
-        
-        # 计算方法相关特征
-        all_methods = []
-        for cls in parse_result.get('classes', []):
-            all_methods.extend(cls.get('methods', []))
-        all_methods.extend(parse_result.get('functions', []))
-        
+        number_of_classes = len(classes)
+        number_of_functions = len(functions)
+        number_of_variables = len(variables)
+
+        # 计算方法相关特征。方法条目会被统计和命名检查多趟访问，
+        # 解析结果的dict先一次性转成固定schema的元组
+        all_methods = [_MethodInfo(m.get('name', ''), m.get('complexity', 1),
+                                   m.get('parameters', 0))
+                       for cls in classes for m in cls.get('methods', [])]
+        all_methods.extend(_MethodInfo(f.get('name', ''), f.get('complexity', 1),
+                                       f.get('parameters', 0))
+                           for f in functions)
+
         number_of_methods = len(all_methods)
         
-        # 方法级特征计算
-        method_complexities = [m.get('complexity', 1) for m in all_methods]
-        method_parameters = [m.get('parameters', 0) for m in all_methods]
-        method_lengths = [self._estimate_method_length(content, m.get('name', '')) for m in all_methods]
-        
-        avg_method_complexity = np.mean(method_complexities) if method_complexities else 0
-        max_method_complexity = max(method_complexities) if method_complexities else 0
-        avg_method_parameters = np.mean(method_parameters) if method_parameters else 0
-        max_method_parameters = max(method_parameters) if method_parameters else 0
-        avg_method_length = np.mean(method_lengths) if method_lengths else 0
-        max_method_length = max(method_lengths) if method_lengths else 0
+        # 方法/类定义行数: 一趟线性扫描建好映射，不再逐名重扫全文
+        method_lens, class_lens = self._all_definition_lengths(content)
+        self.detailed_analysis['method_lens'] = method_lens
+        self.detailed_analysis['class_lens'] = class_lens
+
+        # 方法级特征计算: 三组统计装进一个结构化数组，均值/最大值/阈值
+        # 计数都在同一块连续内存上做向量化归约
+        if all_methods:
+            method_stats = np.fromiter(
+                ((m.complexity, m.parameters,
+                  method_lens.get(m.name.lower(), 0))
+                 for m in all_methods),
+                dtype=np.dtype([('c', 'i4'), ('p', 'i4'), ('l', 'i4')]),
+                count=number_of_methods)
+            avg_method_complexity = method_stats['c'].mean()
+            max_method_complexity = int(method_stats['c'].max())
+            avg_method_parameters = method_stats['p'].mean()
+            max_method_parameters = int(method_stats['p'].max())
+            avg_method_length = method_stats['l'].mean()
+            max_method_length = int(method_stats['l'].max())
+        else:
+            method_stats = None
+            avg_method_complexity = 0
+            max_method_complexity = 0
+            avg_method_parameters = 0
+            max_method_parameters = 0
+            avg_method_length = 0
+            max_method_length = 0
         
         # 类级特征计算
-        classes = parse_result.get('classes', [])
         class_method_counts = [len(cls.get('methods', [])) for cls in classes]
         class_property_counts = [cls.get('properties', 0) for cls in classes]
         
@@ -175,14 +403,19 @@ class FeatureExtractor:
         # 继承深度计算
         inheritance_depth = self._calculate_inheritance_depth(classes)
         
-        # 代码异味计数
-        long_method_count = sum(1 for length in method_lengths if length > self.thresholds['long_method_lines'])
-        long_class_count = sum(1 for cls in classes if self._estimate_class_length(content, cls.get('name', '')) > self.thresholds['long_class_lines'])
-        large_parameter_list_count = sum(1 for params in method_parameters if params > self.thresholds['large_parameter_count'])
-        complex_method_count = sum(1 for complexity in method_complexities if complexity > self.thresholds['complex_method_complexity'])
+        # 代码异味计数: 方法级阈值计数直接在结构化数组上做布尔归约
+        if method_stats is not None:
+            long_method_count = int(np.count_nonzero(method_stats['l'] > self.thresholds['long_method_lines']))
+            large_parameter_list_count = int(np.count_nonzero(method_stats['p'] > self.thresholds['large_parameter_count']))
+            complex_method_count = int(np.count_nonzero(method_stats['c'] > self.thresholds['complex_method_complexity']))
+        else:
+            long_method_count = 0
+            large_parameter_list_count = 0
+            complex_method_count = 0
+        long_class_count = sum(1 for cls in classes if class_lens.get(cls.get('name', '').lower(), 0) > self.thresholds['long_class_lines'])
         
         # 命名约定违规
-        naming_convention_violations = self._check_naming_conventions(parse_result)
+        naming_convention_violations = self._check_naming_conventions(all_methods, classes, variables)
         
         # 注释密度
         comment_ratio = self._calculate_comment_ratio(content)
@@ -213,143 +446,162 @@ class FeatureExtractor:
             comment_ratio=comment_ratio
         )
     
+    @staticmethod
+    def _match_brace(content: str, start_pos: int) -> int:
+        """定位与已进入的'{'配对的'}'，返回其下标（未闭合返回-1）
+
+        用str.find在'{'/'}'之间跳跃，扫描代价与大括号数量成正比，
+        不再逐字符走Python字节码
+        """
+        depth = 1
+        pos = start_pos
+        while depth > 0:
+            next_open = content.find('{', pos)
+            next_close = content.find('}', pos)
+            if next_close == -1:
+                return -1
+            if next_open != -1 and next_open < next_close:
+                depth += 1
+                pos = next_open + 1
+            else:
+                depth -= 1
+                pos = next_close + 1
+        return pos - 1
+
+    def _all_definition_lengths(self, content: str) -> Tuple[Dict[str, int], Dict[str, int]]:
+        """一趟线性扫描算出所有方法/类定义的行数映射（键为小写名）
+
+        每个名字记录其在文件中第一处匹配的结果，与逐名search的
+        "第一处定义"语义一致；大括号未闭合的定义记0。
+        """
+        method_lens: Dict[str, int] = {}
+        for m in _RE_METHOD_DEF_ANY.finditer(content):
+            key = m.group(1).lower()
+            if key not in method_lens:
+                end_pos = self._match_brace(content, m.end())
+                method_lens[key] = (content.count('\n', m.end(), end_pos) + 1
+                                    if end_pos != -1 else 0)
+
+        class_lens: Dict[str, int] = {}
+        for m in _RE_CLASS_DEF_ANY.finditer(content):
+            key = m.group(1).lower()
+            if key not in class_lens:
+                end_pos = self._match_brace(content, m.end())
+                class_lens[key] = (content.count('\n', m.end(), end_pos) + 1
+                                   if end_pos != -1 else 0)
+
+        return method_lens, class_lens
+
     def _estimate_method_length(self, content: str, method_name: str) -> int:
         """估算方法长度"""
         if not method_name:
             return 0
-        
+
         # 查找方法定义
-        pattern = rf'function\s+{re.escape(method_name)}\s*\([^)]*\)\s*\{{'
-        match = re.search(pattern, content, re.IGNORECASE)
+        match = _method_def_pattern(method_name).search(content)
         if not match:
             return 0
-        
+
         start_pos = match.end()
-        brace_count = 1
-        current_pos = start_pos
-        
-        # 找到方法结束位置
-        while current_pos < len(content) and brace_count > 0:
-            if content[current_pos] == '{':
-                brace_count += 1
-            elif content[current_pos] == '}':
-                brace_count -= 1
-            current_pos += 1
-        
-        if brace_count == 0:
-            method_content = content[start_pos:current_pos-1]
-            return method_content.count('\n') + 1
-        
+        end_pos = self._match_brace(content, start_pos)
+        if end_pos != -1:
+            return content.count('\n', start_pos, end_pos) + 1
+
         return 0
-    
+
     def _estimate_class_length(self, content: str, class_name: str) -> int:
         """估算类长度"""
         if not class_name:
             return 0
-        
-        pattern = rf'class\s+{re.escape(class_name)}(?:\s+extends\s+\w+)?(?:\s+implements\s+[^{{]+)?\s*\{{'
-        match = re.search(pattern, content, re.IGNORECASE)
+
+        match = _class_def_pattern(class_name).search(content)
         if not match:
             return 0
-        
+
         start_pos = match.end()
-        brace_count = 1
-        current_pos = start_pos
-        
-        while current_pos < len(content) and brace_count > 0:
-            if content[current_pos] == '{':
-                brace_count += 1
-            elif content[current_pos] == '}':
-                brace_count -= 1
-            current_pos += 1
-        
-        if brace_count == 0:
-            class_content = content[start_pos:current_pos-1]
-            return class_content.count('\n') + 1
-        
+        end_pos = self._match_brace(content, start_pos)
+        if end_pos != -1:
+            return content.count('\n', start_pos, end_pos) + 1
+
         return 0
     
     def _calculate_inheritance_depth(self, classes: List[Dict]) -> int:
-        """计算继承深度"""
+        """计算继承深度
+
+        先按类名建一次索引，父类深度算出后记入memo供兄弟类复用，
+        总代价O(类数)，不再对链上每级父类线性重扫整个类列表。
+        """
+        if not classes:
+            return 0
+
+        # 与原先的线性查找一致：重名类以先出现者为准
+        by_name: Dict[str, Dict] = {}
+        for cls in classes:
+            by_name.setdefault(cls.get('name'), cls)
+
+        memo: Dict[str, int] = {}
+
+        def named_depth(name: str) -> int:
+            """名字查找所解析到的那个类的继承深度（带memo）"""
+            if name in memo:
+                return memo[name]
+            memo[name] = 1  # 占位值，防御环状extends导致无限递归
+            parent = by_name[name].get('extends')
+            if not parent:
+                depth = 1
+            elif parent in by_name:
+                depth = 1 + named_depth(parent)
+            else:
+                depth = 2  # 假设继承了外部类
+            memo[name] = depth
+            return depth
+
+        # 顶层类按自身的extends起步（重名类各走各的链，与原实现一致）
         max_depth = 0
-        
         for cls in classes:
-            depth = 1
-            current_extends = cls.get('extends')
-            
-            # 简单的继承深度计算（在当前类列表中查找）
-            while current_extends:
-                found = False
-                for other_cls in classes:
-                    if other_cls.get('name') == current_extends:
-                        depth += 1
-                        current_extends = other_cls.get('extends')
-                        found = True
-                        break
-                if not found:
-                    depth += 1  # 假设继承了外部类
-                    break
-            
+            parent = cls.get('extends')
+            if not parent:
+                depth = 1
+            elif parent in by_name:
+                depth = 1 + named_depth(parent)
+            else:
+                depth = 2  # 假设继承了外部类
             max_depth = max(max_depth, depth)
-        
+
         return max_depth
     
-    def _check_naming_conventions(self, parse_result: Dict) -> int:
-        """检查命名约定违规"""
+    def _check_naming_conventions(self, all_methods: List[_MethodInfo], classes: List[Dict],
+                                  variables: List[str]) -> int:
+        """检查命名约定违规
+
+        直接复用调用方已建好的all_methods/classes/variables别名，
+        不再从parse_result重新遍历。每类名字用换行拼成一个缓冲后
+        整体扫一次（MULTILINE逐行匹配合规名），违规数=名字总数-
+        合规数，不再逐名调用re.match。名字都是标识符/变量名，
+        不会含换行。
+        """
         violations = 0
-        
+
         # 检查类名（应该是PascalCase）
-        for cls in parse_result.get('classes', []):
-            class_name = cls.get('name', '')
-            if not re.match(r'^[A-Z][a-zA-Z0-9]*$', class_name):
-                violations += 1
-        
-        # 检查方法名（应该是camelCase）
-        all_methods = []
-        for cls in parse_result.get('classes', []):
-            all_methods.extend(cls.get('methods', []))
-        all_methods.extend(parse_result.get('functions', []))
-        
-        for method in all_methods:
-            method_name = method.get('name', '')
-            # 排除魔术方法
-            if not method_name.startswith('__') and not re.match(r'^[a-z][a-zA-Z0-9]*$', method_name):
-                violations += 1
-        
+        class_names = [cls.get('name', '') for cls in classes]
+        if class_names:
+            violations += len(class_names) - len(_RE_PASCAL_CLASS.findall('\n'.join(class_names)))
+
+        # 检查方法名（应该是camelCase，排除魔术方法）
+        method_names = [m.name for m in all_methods if not m.name.startswith('__')]
+        if method_names:
+            violations += len(method_names) - len(_RE_CAMEL_METHOD.findall('\n'.join(method_names)))
+
         # 检查变量名（应该以$开头，然后是camelCase或snake_case）
-        for var in parse_result.get('variables', []):
-            if not re.match(r'^\$[a-z][a-zA-Z0-9_]*$', var):
-                violations += 1
-        
+        if variables:
+            violations += len(variables) - len(_RE_VAR_NAME.findall('\n'.join(variables)))
+
         return violations
     
     def _calculate_comment_ratio(self, content: str) -> float:
         """计算注释密度"""
-        lines = content.split('\n')
-        total_lines = len(lines)
-        comment_lines = 0
-        
-        in_block_comment = False
-        
-        for line in lines:
-            stripped = line.strip()
-            
-            # 块注释
-            if '/*' in stripped:
-                in_block_comment = True
-            if '*/' in stripped:
-                in_block_comment = False
-                comment_lines += 1
-                continue
-            
-            if in_block_comment:
-                comment_lines += 1
-                continue
-            
-            # 单行注释
-            if stripped.startswith('//') or stripped.startswith('#'):
-                comment_lines += 1
-        
+        buf = np.frombuffer(content.encode('utf-8'), dtype=np.uint8)
+        comment_lines, total_lines = _count_comment_lines(buf)
         return comment_lines / total_lines if total_lines > 0 else 0
 
 def main():
@@ -8,9 +8,10 @@ AI代码异味检测主程序
 import os
 import sys
 import argparse
-import glob
 import json
+import time
 from typing import List
+from concurrent.futures import ProcessPoolExecutor
 import warnings
 warnings.filterwarnings('ignore')
 
@@ -18,31 +19,47 @@ warnings.filterwarnings('ignore')
 sys.path.append(os.path.dirname(os.path.abspath(__file__)))
 
 from code_smell_detector import CodeSmellDetector
-from model_trainer import ModelTrainer
-from feature_extractor import FeatureExtractor
+from feature_extractor import FeatureExtractor, CodeFeatures
 from php_parser import PHPParser
 
+# 按严重程度显示的图标，放在模块级避免每条问题都重建dict
+_SEVERITY_ICON = {'error': '🚨', 'warning': '⚠️', 'info': 'ℹ️'}
+
+def _iter_php_files(directory: str, recursive: bool):
+    """用os.scandir懒惰遍历PHP文件
+
+    DirEntry自带类型信息，不必逐文件stat，也省掉glob的fnmatch开销；
+    与glob一致，点开头的隐藏文件/目录（如.git、缓存目录）不参与匹配。
+    """
+    stack = [directory]
+    while stack:
+        current = stack.pop()
+        try:
+            entries = os.scandir(current)
+        except OSError:
+            continue
+        with entries:
+            for entry in entries:
+                if entry.name.startswith('.'):
+                    continue
+                if entry.is_dir(follow_symlinks=False):
+                    if recursive:
+                        stack.append(entry.path)
+                elif entry.name.endswith('.php'):
+                    yield entry.path
+
 def find_php_files(directory: str, recursive: bool = True) -> List[str]:
     """
     查找目录中的PHP文件
-    
+
     Args:
         directory: 搜索目录
         recursive: 是否递归搜索
-        
+
     Returns:
         PHP文件路径列表
     """
-    php_files = []
-    
-    if recursive:
-        pattern = os.path.join(directory, "**", "*.php")
-        php_files = glob.glob(pattern, recursive=True)
-    else:
-        pattern = os.path.join(directory, "*.php")
-        php_files = glob.glob(pattern)
-    
-    return php_files
+    return list(_iter_php_files(directory, recursive))
 
 def detect_command(args):
     """检测命令处理"""
@@ -55,10 +72,7 @@ def detect_command(args):
     php_files = []
     
     if args.file:
-        # 检测单个文件
-        if not os.path.exists(args.file):
-            print(f"❌ 错误: 文件不存在 {args.file}")
-            return
+        # 检测单个文件（EAFP: 不预检存在性，文件缺失由检测时的打开报错）
         php_files = [args.file]
     elif args.directory:
         # 检测目录中的文件
@@ -117,7 +131,7 @@ def detect_command(args):
             if result.issues:
                 print("   问题:")
                 for issue in result.issues:
-                    severity_icon = {'error': '🚨', 'warning': '⚠️', 'info': 'ℹ️'}.get(issue['severity'], 'ℹ️')
+                    severity_icon = _SEVERITY_ICON.get(issue['severity'], 'ℹ️')
                     print(f"   {severity_icon} {issue['message']}: {issue['details']}")
             
             if result.suggestions and args.suggestions:
@@ -132,8 +146,12 @@ def detect_command(args):
 
 def train_command(args):
     """训练命令处理"""
+    # 延迟导入：训练器会连带加载matplotlib等重依赖，
+    # detect/analyze/--help路径不必付这几百毫秒的启动开销
+    from model_trainer import ModelTrainer
+
     print("🚀 开始训练机器学习模型...")
-    
+
     # 初始化训练器
     trainer = ModelTrainer(models_dir=args.models_dir)
     
@@ -187,6 +205,55 @@ def train_command(args):
                 shutil.rmtree(temp_dir)
                 print(f"🧹 已清理临时目录: {temp_dir}")
 
+class _Progress:
+    """按时间限频的进度输出
+
+    快速流水线处理小文件时逐批print会占掉可观的运行时间，
+    这里最多每秒输出一次，结束时补齐最终进度。
+    """
+
+    def __init__(self, total: int, interval: float = 1.0):
+        self.total = total
+        self.interval = interval
+        self._last = time.monotonic()
+
+    def step(self, done: int):
+        now = time.monotonic()
+        if done == self.total or now - self._last >= self.interval:
+            print(f"已分析 {done}/{self.total} 个文件")
+            self._last = now
+
+def _print_file_features(file_path: str, features: CodeFeatures):
+    """打印单个文件的特征摘要（--verbose模式）"""
+    print(f"\n📄 {os.path.basename(file_path)}:")
+    print(f"   代码行数: {features.lines_of_code}")
+    print(f"   圈复杂度: {features.cyclomatic_complexity}")
+    print(f"   类数量: {features.number_of_classes}")
+    print(f"   方法数量: {features.number_of_methods}")
+    print(f"   平均方法复杂度: {features.avg_method_complexity:.2f}")
+    print(f"   命名约定违规: {features.naming_convention_violations}")
+    print(f"   注释密度: {features.comment_ratio:.2%}")
+
+def _analyze_files_serial(extractor: FeatureExtractor, php_files: List[str],
+                          verbose: bool) -> list:
+    """串行分析文件（小批量或进程池不可用时的路径）"""
+    all_features = []
+    progress = _Progress(len(php_files))
+    for i, file_path in enumerate(php_files):
+        try:
+            features = extractor.extract_features(file_path)
+            all_features.append((file_path, features))
+
+            if verbose:
+                _print_file_features(file_path, features)
+
+            progress.step(i + 1)
+
+        except Exception as e:
+            print(f"分析文件 {file_path} 时出错: {e}")
+            continue
+    return all_features
+
 def analyze_command(args):
     """分析命令处理"""
     print("📊 开始代码分析...")
@@ -196,9 +263,7 @@ def analyze_command(args):
     
     # 确定要分析的文件
     if args.file:
-        if not os.path.exists(args.file):
-            print(f"❌ 错误: 文件不存在 {args.file}")
-            return
+        # EAFP: 不预检存在性，文件缺失由分析时的打开报错
         php_files = [args.file]
     elif args.directory:
         if not os.path.exists(args.directory):
@@ -215,30 +280,32 @@ def analyze_command(args):
     
     print(f"📁 找到 {len(php_files)} 个PHP文件")
     
-    # 分析文件
-    all_features = []
-    for i, file_path in enumerate(php_files):
+    # 分析文件（特征提取CPU密集且各文件相互独立，文件多时用进程池并行）
+    if len(php_files) < 4:
+        all_features = _analyze_files_serial(extractor, php_files, args.verbose)
+    else:
+        all_features = []
+        progress = _Progress(len(php_files))
         try:
-            features = extractor.extract_features(file_path)
-            all_features.append((file_path, features))
-            
-            if args.verbose:
-                print(f"\n📄 {os.path.basename(file_path)}:")
-                print(f"   代码行数: {features.lines_of_code}")
-                print(f"   圈复杂度: {features.cyclomatic_complexity}")
-                print(f"   类数量: {features.number_of_classes}")
-                print(f"   方法数量: {features.number_of_methods}")
-                print(f"   平均方法复杂度: {features.avg_method_complexity:.2f}")
-                print(f"   命名约定违规: {features.naming_convention_violations}")
-                print(f"   注释密度: {features.comment_ratio:.2%}")
-            
-            if (i + 1) % 10 == 0:
-                print(f"已分析 {i + 1}/{len(php_files)} 个文件")
-                
+            with ProcessPoolExecutor(initializer=_init_analyze_worker) as pool:
+                futures = [(p, pool.submit(_extract_one, p)) for p in php_files]
+                for i, (file_path, future) in enumerate(futures):
+                    try:
+                        features = future.result()
+                    except Exception as e:
+                        print(f"分析文件 {file_path} 时出错: {e}")
+                        continue
+                    all_features.append((file_path, features))
+
+                    if args.verbose:
+                        _print_file_features(file_path, features)
+
+                    progress.step(i + 1)
         except Exception as e:
-            print(f"分析文件 {file_path} 时出错: {e}")
-            continue
-    
+            # 进程池不可用（受限环境等）时回退到串行分析
+            print(f"多进程分析不可用，回退到串行: {e}")
+            all_features = _analyze_files_serial(extractor, php_files, args.verbose)
+
     # 生成统计报告
     if all_features:
         print(f"\n📈 统计摘要 (基于 {len(all_features)} 个文件):")
@@ -278,6 +345,18 @@ def analyze_command(args):
             if len(problematic_files) > 5:
                 print(f"   ... 还有 {len(problematic_files) - 5} 个文件")
 
+# 进程池worker: 每个子进程只构建一次特征提取器，不随任务反复序列化传输
+_WORKER_EXTRACTOR = None
+
+def _init_analyze_worker():
+    """进程池初始化函数，在子进程内构建特征提取器"""
+    global _WORKER_EXTRACTOR
+    _WORKER_EXTRACTOR = FeatureExtractor()
+
+def _extract_one(file_path: str) -> CodeFeatures:
+    """用子进程内的提取器提取单个文件的特征"""
+    return _WORKER_EXTRACTOR.extract_features(file_path)
+
 def main():
     """主函数"""
     parser = argparse.ArgumentParser(
@@ -7,46 +7,148 @@
 
 import os
 import json
-import pickle
+import joblib
 import numpy as np
 import pandas as pd
 from typing import List, Tuple, Dict, Any
-from sklearn.model_selection import train_test_split, cross_val_score, GridSearchCV
+from sklearn.model_selection import train_test_split, cross_val_score
+# 逐次减半搜索在sklearn中仍标记为experimental，需显式启用
+from sklearn.experimental import enable_halving_search_cv  # noqa: F401
+from sklearn.model_selection import HalvingGridSearchCV
 from sklearn.preprocessing import StandardScaler, LabelEncoder
-from sklearn.ensemble import RandomForestClassifier, GradientBoostingClassifier
+from sklearn.ensemble import RandomForestClassifier, HistGradientBoostingClassifier
 from sklearn.svm import SVC
 from sklearn.linear_model import LogisticRegression
 from sklearn.metrics import classification_report, confusion_matrix, accuracy_score
 from sklearn.pipeline import Pipeline
-import matplotlib.pyplot as plt
-import seaborn as sns
-from feature_extractor import FeatureExtractor, CodeFeatures
+from joblib import Parallel, delayed
+from feature_extractor import FeatureExtractor, CodeFeatures, N_FEATURES
+
+# joblib子进程内惰性构建的提取器（按缓存目录各建一个）。不直接pickle
+# 主进程的提取器：它持有的PHPParser析构时会删掉临时tokenizer脚本，
+# 跨进程共享会互删
+_WORKER_EXTRACTORS: Dict[str, FeatureExtractor] = {}
+
+def _extract_training_vector(file_path: str, cache_dir: str = '.aicr_cache'):
+    """提取单个文件的特征向量（joblib worker，也可串行调用）
+
+    返回(向量, None)或(None, 错误信息)；异常在worker内转成
+    信息串带回主进程统一打印，保证返回值可pickle。
+    """
+    extractor = _WORKER_EXTRACTORS.get(cache_dir)
+    if extractor is None:
+        extractor = _WORKER_EXTRACTORS[cache_dir] = FeatureExtractor(cache_dir=cache_dir)
+    try:
+        return extractor.extract_features(file_path).to_vector(), None
+    except FileNotFoundError:
+        return None, f"警告: 文件不存在 {file_path}"
+    except Exception as e:
+        return None, f"处理文件 {file_path} 时出错: {e}"
+
+def _train_one(model_name, model, param_grid,
+               X_train, X_test, y_train, y_test,
+               use_grid_search: bool, classes: np.ndarray):
+    """训练并评估单个模型（joblib worker，也可串行调用）
+
+    内层搜索/交叉验证固定n_jobs=1：并行度由外层按模型划分，
+    嵌套再开进程池只会互相争抢核心。返回(结果dict或None, 日志行)，
+    打印集中回主进程做，避免多worker输出交错。
+    """
+    messages = []
+    try:
+        if use_grid_search and param_grid:
+            # 逐次减半搜索优化参数：全部候选先在小样本量上粗筛，
+            # 幸存者每轮按factor=3扩大资源复赛，比穷举少数倍拟合
+            grid_search = HalvingGridSearchCV(
+                model, param_grid,
+                factor=3, resource='n_samples',
+                cv=5, scoring='accuracy', n_jobs=1
+            )
+            grid_search.fit(X_train, y_train)
+            best_model = grid_search.best_estimator_
+            messages.append(f"最佳参数: {grid_search.best_params_}")
+        else:
+            best_model = model
+            best_model.fit(X_train, y_train)
+
+        # 预测：predict和predict_proba各自完整遍历一遍模型
+        # （森林模型是整片树），同一X_test只推理一次，类别取
+        # 概率argmax。argmax给的是classes_里的下标，映射回
+        # 类别编码（训练集缺类时两者不相同）
+        if hasattr(best_model, 'predict_proba'):
+            y_pred_proba = best_model.predict_proba(X_test)
+            y_pred = best_model.classes_[np.argmax(y_pred_proba, axis=1)]
+        else:
+            y_pred = best_model.predict(X_test)
+            y_pred_proba = None
+
+        # 计算指标
+        accuracy = accuracy_score(y_test, y_pred)
+        cv_scores = cross_val_score(best_model, X_train, y_train, cv=5, n_jobs=1)
+
+        # 分类报告（类别表是全量15类，只报告实际出现的那些）
+        present = np.unique(np.concatenate((y_test, y_pred)))
+        class_report = classification_report(
+            y_test, y_pred,
+            labels=present,
+            target_names=classes[present],
+            output_dict=True
+        )
+
+        result = {
+            'model': best_model,
+            'accuracy': accuracy,
+            'cv_mean': cv_scores.mean(),
+            'cv_std': cv_scores.std(),
+            'classification_report': class_report,
+            'predictions': y_pred,
+            'probabilities': y_pred_proba,
+            'test_labels': y_test
+        }
+        messages.append(f"{model_name} - 准确率: {accuracy:.4f}")
+        messages.append(f"{model_name} - 交叉验证: {cv_scores.mean():.4f} (±{cv_scores.std()*2:.4f})")
+        return result, messages
+    except Exception as e:
+        messages.append(f"训练 {model_name} 时出错: {e}")
+        return None, messages
 
 class ModelTrainer:
-    def __init__(self, models_dir: str = "models"):
+    def __init__(self, models_dir: str = "models", n_jobs: int = -1):
         """
         初始化模型训练器
-        
+
         Args:
             models_dir: 模型保存目录
+            n_jobs: 特征提取的并行进程数（沿用sklearn约定，-1为全部核心）
         """
         self.models_dir = models_dir
-        self.feature_extractor = FeatureExtractor()
-        self.scaler = StandardScaler()
-        self.label_encoder = LabelEncoder()
-        
+        self.n_jobs = n_jobs
+        # 训练用的特征缓存与模型工件放在一起，超参数扫描/反复训练时
+        # 未变更的文件直接命中缓存，整条PHP子进程+正则路径都被跳过
+        self.feature_cache_dir = os.path.join(models_dir, 'feature_cache')
+        self.feature_extractor = FeatureExtractor(cache_dir=self.feature_cache_dir)
+
         # 确保模型目录存在
         os.makedirs(models_dir, exist_ok=True)
         
+        # 标准化只对尺度敏感的模型有意义；树模型对特征尺度不变，
+        # 白做一遍transform还得在内存里多留一份缩放后的矩阵
+        scale_needed = {'svm', 'logistic_regression'}
+
         # 定义可用的模型
-        self.models = {
+        base_models = {
             'random_forest': RandomForestClassifier(
                 n_estimators=100,
                 random_state=42,
                 n_jobs=-1
             ),
-            'gradient_boosting': GradientBoostingClassifier(
-                n_estimators=100,
+            # 直方图分箱实现，比逐样本分裂的GradientBoostingClassifier
+            # 快一到两个数量级，且原生多线程。早停取'auto'：大样本时自动
+            # 启用省掉多余的树，小样本（如合成演示数据）时内部分层验证
+            # 集不够每类一个样本，强制开启会直接报错
+            'gradient_boosting': HistGradientBoostingClassifier(
+                max_iter=200,
+                early_stopping='auto',
                 random_state=42
             ),
             'svm': SVC(
@@ -59,7 +161,14 @@ class ModelTrainer:
                 max_iter=1000
             )
         }
-        
+        # 需要标准化的模型包成Pipeline自带scaler，其余直接吃原始矩阵；
+        # GridSearchCV克隆Pipeline时每折独立拟合scaler，不会泄漏测试折
+        self.models = {
+            name: Pipeline([('scaler', StandardScaler()), ('clf', model)])
+            if name in scale_needed else model
+            for name, model in base_models.items()
+        }
+
         # 代码异味类型定义
         self.code_smell_types = [
             'clean',                    # 清洁代码
@@ -78,7 +187,11 @@ class ModelTrainer:
             'critical_issues',          # 严重问题
             'code_quality_issues'       # 代码质量问题
         ]
-    
+
+        # 标签编码的固定类别表：编码即pd.Categorical的codes（C实现的
+        # 哈希查表），类别顺序跨次运行稳定，不随训练集里出现的标签漂移
+        self.label_encoder_classes_ = np.asarray(self.code_smell_types, dtype=object)
+
     def prepare_training_data(self, php_files: List[str], labels: List[str]) -> Tuple[np.ndarray, np.ndarray]:
         """
         准备训练数据
@@ -90,37 +203,49 @@ class ModelTrainer:
         Returns:
             特征矩阵和标签数组
         """
-        features_list = []
-        valid_labels = []
-        
         print(f"正在处理 {len(php_files)} 个PHP文件...")
-        
-        for i, (file_path, label) in enumerate(zip(php_files, labels)):
-            try:
-                if not os.path.exists(file_path):
-                    print(f"警告: 文件不存在 {file_path}")
-                    continue
-                
-                features = self.feature_extractor.extract_features(file_path)
-                features_list.append(features.to_vector())
-                valid_labels.append(label)
-                
-                if (i + 1) % 10 == 0:
-                    print(f"已处理 {i + 1}/{len(php_files)} 个文件")
-                    
-            except Exception as e:
-                print(f"处理文件 {file_path} 时出错: {e}")
+
+        # 特征提取以PHP子进程和正则为主、各文件独立，用joblib摊到所有
+        # 核心上（与sklearn共用loky后端）；进程池不可用时回退到串行
+        try:
+            outputs = Parallel(n_jobs=self.n_jobs)(
+                delayed(_extract_training_vector)(p, self.feature_cache_dir)
+                for p in php_files)
+        except Exception as e:
+            print(f"多进程提取不可用，回退到串行: {e}")
+            outputs = [_extract_training_vector(p, self.feature_cache_dir)
+                       for p in php_files]
+
+        # 预分配整块float32特征矩阵并逐行原地写入，
+        # 省掉list-of-vectors再np.array的第二份完整拷贝
+        X = np.empty((len(php_files), N_FEATURES), dtype=np.float32)
+        valid = np.zeros(len(php_files), dtype=bool)
+        valid_labels = []
+        for i, ((vector, error), label) in enumerate(zip(outputs, labels)):
+            if error is not None:
+                print(error)
                 continue
-        
-        if not features_list:
+            X[i] = vector
+            valid[i] = True
+            valid_labels.append(label)
+
+        if not valid_labels:
             raise ValueError("没有成功处理任何文件")
-        
-        X = np.array(features_list)
-        y = np.array(valid_labels)
-        
-        print(f"成功处理 {len(features_list)} 个文件")
+
+        if not valid.all():
+            X = X[valid]
+
+        # 标签一次性按固定类别表向量化编码，取代LabelEncoder逐元素的
+        # O(N·K)查找；后续train_models直接使用整型编码
+        codes = pd.Categorical(valid_labels, categories=self.code_smell_types).codes
+        if (codes < 0).any():
+            unknown = sorted({l for l, c in zip(valid_labels, codes) if c < 0})
+            raise ValueError(f"未知的标签: {unknown}")
+        y = codes.astype(np.int32)
+
+        print(f"成功处理 {len(valid_labels)} 个文件")
         print(f"特征维度: {X.shape}")
-        print(f"标签分布: {dict(zip(*np.unique(y, return_counts=True)))}")
+        print(f"标签分布: {dict(zip(*np.unique(valid_labels, return_counts=True)))}")
         
         return X, y
     
@@ -132,87 +257,48 @@ class ModelTrainer:
         
         Args:
             X: 特征矩阵
-            y: 标签数组
+            y: 标签数组（prepare_training_data输出的整型编码）
             test_size: 测试集比例
             use_grid_search: 是否使用网格搜索优化参数
-            
+
         Returns:
             训练结果字典
         """
-        # 分割数据
-        X_train, X_test, y_train, y_test = train_test_split(
+        # 分割数据（y已是按固定类别表编码的整型，无需再做标签编码）。
+        # 特征直接喂原始矩阵：需要标准化的模型自己的Pipeline里带scaler
+        X_train, X_test, y_train_encoded, y_test_encoded = train_test_split(
             X, y, test_size=test_size, random_state=42, stratify=y
         )
-        
-        # 标准化特征
-        X_train_scaled = self.scaler.fit_transform(X_train)
-        X_test_scaled = self.scaler.transform(X_test)
-        
-        # 编码标签
-        y_train_encoded = self.label_encoder.fit_transform(y_train)
-        y_test_encoded = self.label_encoder.transform(y_test)
-        
-        results = {}
-        
+
         print("开始训练模型...")
-        
-        for model_name, model in self.models.items():
+
+        # 两级并行折叠成一级：外层按模型各起一个worker同时训练，
+        # 内层搜索/交叉验证串行（见_train_one）。单个模型的小网格
+        # 吃不满所有核心，四个模型并排跑利用率更高；进程池不可用
+        # 时回退到逐模型串行
+        items = list(self.models.items())
+        try:
+            outputs = Parallel(n_jobs=len(items), backend='loky')(
+                delayed(_train_one)(
+                    model_name, model, self._get_param_grid(model_name),
+                    X_train, X_test, y_train_encoded, y_test_encoded,
+                    use_grid_search, self.label_encoder_classes_)
+                for model_name, model in items)
+        except Exception as e:
+            print(f"多进程训练不可用，回退到串行: {e}")
+            outputs = [_train_one(model_name, model, self._get_param_grid(model_name),
+                                  X_train, X_test, y_train_encoded, y_test_encoded,
+                                  use_grid_search, self.label_encoder_classes_)
+                       for model_name, model in items]
+
+        results = {}
+        for (model_name, _), (result, messages) in zip(items, outputs):
             print(f"\n训练 {model_name}...")
-            
-            try:
-                if use_grid_search:
-                    # 使用网格搜索优化参数
-                    param_grid = self._get_param_grid(model_name)
-                    if param_grid:
-                        grid_search = GridSearchCV(
-                            model, param_grid, 
-                            cv=5, scoring='accuracy', 
-                            n_jobs=-1, verbose=1
-                        )
-                        grid_search.fit(X_train_scaled, y_train_encoded)
-                        best_model = grid_search.best_estimator_
-                        print(f"最佳参数: {grid_search.best_params_}")
-                    else:
-                        best_model = model
-                        best_model.fit(X_train_scaled, y_train_encoded)
-                else:
-                    best_model = model
-                    best_model.fit(X_train_scaled, y_train_encoded)
-                
-                # 预测
-                y_pred = best_model.predict(X_test_scaled)
-                y_pred_proba = best_model.predict_proba(X_test_scaled) if hasattr(best_model, 'predict_proba') else None
-                
-                # 计算指标
-                accuracy = accuracy_score(y_test_encoded, y_pred)
-                cv_scores = cross_val_score(best_model, X_train_scaled, y_train_encoded, cv=5)
-                
-                # 分类报告
-                target_names = self.label_encoder.classes_
-                class_report = classification_report(
-                    y_test_encoded, y_pred, 
-                    target_names=target_names,
-                    output_dict=True
-                )
-                
-                results[model_name] = {
-                    'model': best_model,
-                    'accuracy': accuracy,
-                    'cv_mean': cv_scores.mean(),
-                    'cv_std': cv_scores.std(),
-                    'classification_report': class_report,
-                    'predictions': y_pred,
-                    'probabilities': y_pred_proba,
-                    'test_labels': y_test_encoded
-                }
-                
-                print(f"{model_name} - 准确率: {accuracy:.4f}")
-                print(f"{model_name} - 交叉验证: {cv_scores.mean():.4f} (±{cv_scores.std()*2:.4f})")
-                
-            except Exception as e:
-                print(f"训练 {model_name} 时出错: {e}")
-                continue
-        
+            for line in messages:
+                print(line)
+            if result is not None:
+                results[model_name] = result
+
         # 保存预处理器
         self._save_preprocessors()
         
@@ -227,18 +313,19 @@ class ModelTrainer:
                 'min_samples_split': [2, 5, 10]
             },
             'gradient_boosting': {
-                'n_estimators': [50, 100, 200],
+                'max_iter': [100, 200, 400],
                 'learning_rate': [0.01, 0.1, 0.2],
-                'max_depth': [3, 5, 7]
+                'max_leaf_nodes': [15, 31, 63]
             },
+            # svm/logistic_regression是Pipeline，参数名带clf__前缀
             'svm': {
-                'C': [0.1, 1, 10],
-                'gamma': ['scale', 'auto']
+                'clf__C': [0.1, 1, 10],
+                'clf__gamma': ['scale', 'auto']
             },
             'logistic_regression': {
-                'C': [0.1, 1, 10],
-                'penalty': ['l1', 'l2'],
-                'solver': ['liblinear', 'lbfgs']
+                'clf__C': [0.1, 1, 10],
+                'clf__penalty': ['l1', 'l2'],
+                'clf__solver': ['liblinear', 'lbfgs']
             }
         }
         
@@ -259,10 +346,10 @@ class ModelTrainer:
         best_model_name = max(results.keys(), key=lambda k: results[k][metric])
         best_model = results[best_model_name]['model']
         
-        # 保存模型
+        # 保存模型：protocol 5走numpy数组的零拷贝带外缓冲序列化，
+        # zlib压缩让森林类模型的工件缩小数倍
         model_path = os.path.join(self.models_dir, f'best_model_{best_model_name}.pkl')
-        with open(model_path, 'wb') as f:
-            pickle.dump(best_model, f)
+        joblib.dump(best_model, model_path, compress=3, protocol=5)
         
         # 保存模型信息
         model_info = {
@@ -271,7 +358,7 @@ class ModelTrainer:
             'cv_mean': results[best_model_name]['cv_mean'],
             'cv_std': results[best_model_name]['cv_std'],
             'feature_names': CodeFeatures.get_feature_names(),
-            'label_classes': self.label_encoder.classes_.tolist()
+            'label_classes': self.label_encoder_classes_.tolist()
         }
         
         info_path = os.path.join(self.models_dir, 'model_info.json')
@@ -285,13 +372,20 @@ class ModelTrainer:
     
     def _save_preprocessors(self):
         """保存预处理器"""
+        # 检测器加载scaler.pkl后对特征矩阵做transform再送进模型。
+        # 现在标准化已随需要它的模型进了Pipeline、树模型吃原始特征，
+        # 这里写出一个恒等scaler（不减均值不除方差）保持工件契约不变
+        scaler = StandardScaler(with_mean=False, with_std=False)
+        scaler.fit(np.zeros((1, N_FEATURES), dtype=np.float32))
         scaler_path = os.path.join(self.models_dir, 'scaler.pkl')
-        with open(scaler_path, 'wb') as f:
-            pickle.dump(self.scaler, f)
-        
+        joblib.dump(scaler, scaler_path, compress=3, protocol=5)
+
+        # 检测器端仍通过label_encoder.pkl做inverse_transform，
+        # 写出一个按同一类别表装配好的LabelEncoder保持工件兼容
+        encoder = LabelEncoder()
+        encoder.classes_ = self.label_encoder_classes_
         encoder_path = os.path.join(self.models_dir, 'label_encoder.pkl')
-        with open(encoder_path, 'wb') as f:
-            pickle.dump(self.label_encoder, f)
+        joblib.dump(encoder, encoder_path, compress=3, protocol=5)
     
     def plot_results(self, results: Dict[str, Any], save_path: str = None):
         """
@@ -301,6 +395,10 @@ class ModelTrainer:
             results: 训练结果
             save_path: 保存路径
         """
+        # 延迟导入：绘图库启动开销大，只有用到--plot时才加载
+        import matplotlib.pyplot as plt
+        import seaborn as sns
+
         fig, axes = plt.subplots(2, 2, figsize=(15, 10))
         
         # 1. 模型准确率比较
@@ -319,10 +417,13 @@ class ModelTrainer:
         best_model_name = max(results.keys(), key=lambda k: results[k]['accuracy'])
         best_result = results[best_model_name]
         
-        cm = confusion_matrix(best_result['test_labels'], best_result['predictions'])
-        sns.heatmap(cm, annot=True, fmt='d', ax=axes[0, 1], 
-                   xticklabels=self.label_encoder.classes_,
-                   yticklabels=self.label_encoder.classes_)
+        present = np.unique(np.concatenate(
+            (best_result['test_labels'], best_result['predictions'])))
+        cm = confusion_matrix(best_result['test_labels'], best_result['predictions'],
+                              labels=present)
+        sns.heatmap(cm, annot=True, fmt='d', ax=axes[0, 1],
+                   xticklabels=self.label_encoder_classes_[present],
+                   yticklabels=self.label_encoder_classes_[present])
         axes[0, 1].set_title(f'{best_model_name} 混淆矩阵')
         axes[0, 1].set_xlabel('预测标签')
         axes[0, 1].set_ylabel('真实标签')
@@ -345,7 +446,7 @@ class ModelTrainer:
         if len(results) > 0:
             first_result = list(results.values())[0]
             unique, counts = np.unique(first_result['test_labels'], return_counts=True)
-            class_names = [self.label_encoder.classes_[i] for i in unique]
+            class_names = [self.label_encoder_classes_[i] for i in unique]
             
             axes[1, 1].pie(counts, labels=class_names, autopct='%1.1f%%')
             axes[1, 1].set_title('测试集类别分布')
@@ -482,24 +583,33 @@ class ComplexExample {
         }
         
         temp_dir = tempfile.mkdtemp()
-        
+
+        # 每个模板只落盘一次、样本复用同一路径：同一份文本没必要写
+        # num_samples/5份副本，特征提取时也只需真正解析5个文件
+        # （路径与内容哈希缓存全部命中）
+        template_files = {}
+        for smell_type, content in templates.items():
+            temp_file = os.path.join(temp_dir, f'template_{smell_type}.php')
+            with open(temp_file, 'w', encoding='utf-8') as f:
+                f.write(content)
+            template_files[smell_type] = temp_file
+
         for i in range(num_samples):
             # 随机选择代码异味类型
             smell_type = np.random.choice(list(templates.keys()))
-            
-            # 生成临时文件
-            temp_file = os.path.join(temp_dir, f'sample_{i}_{smell_type}.php')
-            with open(temp_file, 'w', encoding='utf-8') as f:
-                f.write(templates[smell_type])
-            
-            synthetic_files.append(temp_file)
+            synthetic_files.append(template_files[smell_type])
             synthetic_labels.append(smell_type)
         
         print(f"生成了 {num_samples} 个合成样本到 {temp_dir}")
         return synthetic_files, synthetic_labels
 
-def main():
-    """演示模型训练流程"""
+def main(enable_plots: bool = False):
+    """演示模型训练流程
+
+    Args:
+        enable_plots: 是否生成训练结果图表。默认关闭：无头环境下
+            matplotlib的导入和plt.show()要么白费数秒要么直接阻塞
+    """
     trainer = ModelTrainer()
     
     # 生成合成数据进行演示
@@ -516,8 +626,9 @@ def main():
         # 保存最佳模型
         best_model = trainer.save_best_model(results)
         
-        # 绘制结果
-        trainer.plot_results(results, 'training_results.png')
+        # 绘制结果（按需开启，绘图库在plot_results内部延迟导入）
+        if enable_plots:
+            trainer.plot_results(results, 'training_results.png')
         
         print(f"\n训练完成！最佳模型: {best_model}")
         
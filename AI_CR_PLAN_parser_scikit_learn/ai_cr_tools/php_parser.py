@@ -8,11 +8,107 @@ PHP代码解析器
 import subprocess
 import json
 import re
+import select
 import tempfile
+import threading
 import os
+import numpy as np
 from typing import Dict, List, Any, Optional
 from dataclasses import dataclass
 
+try:
+    from numba import njit
+    _HAVE_NUMBA = True
+except ImportError:
+    _HAVE_NUMBA = False
+
+try:
+    # orjson的C解析器比stdlib json快数倍，解析大文件的token输出时可观
+    from orjson import loads as _json_loads
+except ImportError:
+    _json_loads = json.loads
+
+# 备用正则解析的预编译模式（模块级常量，不逐次调用重建）。
+# 复杂度关键词合成一个交替式，一次findall顶替逐关键词的九趟全文扫描；
+# \b约束保证每个词只被恰好一个分支算一次（如elseif不会再触发else/if）
+_RE_SIMPLE_KEYWORDS = re.compile(
+    r'\b(?:if|elseif|else|while|for|foreach|switch|case|catch)\b', re.IGNORECASE)
+
+# 复杂度关键词的字节表（定长填充+实际长度），供numba状态机逐词比对
+_SIMPLE_KEYWORDS = ('if', 'elseif', 'else', 'while', 'for',
+                    'foreach', 'switch', 'case', 'catch')
+_KW_LENS = np.array([len(k) for k in _SIMPLE_KEYWORDS], dtype=np.int64)
+_KW_TABLE = np.zeros((len(_SIMPLE_KEYWORDS), int(_KW_LENS.max())), dtype=np.uint8)
+for _row, _kw in enumerate(_SIMPLE_KEYWORDS):
+    _KW_TABLE[_row, :len(_kw)] = np.frombuffer(_kw.encode('ascii'), dtype=np.uint8)
+
+if _HAVE_NUMBA:
+    @njit(cache=True)
+    def _count_keywords_jit(buf, kw_table, kw_lens):
+        """单趟字节状态机统计复杂度关键词出现次数
+
+        沿标识符边界切词（字母/数字/下划线算词内），每个完整标识符按
+        小写与关键词表比对；对纯ASCII输入与\\b包裹的忽略大小写正则
+        语义完全一致。
+        """
+        count = 0
+        n = buf.shape[0]
+        max_len = kw_table.shape[1]
+        i = 0
+        while i < n:
+            c = buf[i]
+            if (48 <= c <= 57) or (65 <= c <= 90) or (97 <= c <= 122) or c == 95:
+                start = i
+                i += 1
+                while i < n:
+                    c = buf[i]
+                    if (48 <= c <= 57) or (65 <= c <= 90) or (97 <= c <= 122) \
+                            or c == 95:
+                        i += 1
+                    else:
+                        break
+                length = i - start
+                if length <= max_len:
+                    for k in range(kw_lens.shape[0]):
+                        if kw_lens[k] != length:
+                            continue
+                        match = True
+                        for j in range(length):
+                            b = buf[start + j]
+                            if 65 <= b <= 90:
+                                b += 32
+                            if b != kw_table[k, j]:
+                                match = False
+                                break
+                        if match:
+                            count += 1
+                            break
+            else:
+                i += 1
+        return count
+
+def _count_simple_keywords(content: str) -> int:
+    """统计备用解析的复杂度关键词数
+
+    numba可用且内容为纯ASCII时走JIT字节状态机（单趟扫描、无正则
+    引擎开销且与正则结果严格一致）；含非ASCII字符时\\b的Unicode
+    词界语义只有正则引擎能精确给出，退回预编译findall。
+    """
+    if _HAVE_NUMBA and content.isascii():
+        buf = np.frombuffer(content.encode('ascii'), dtype=np.uint8)
+        return int(_count_keywords_jit(buf, _KW_TABLE, _KW_LENS))
+    return len(_RE_SIMPLE_KEYWORDS.findall(content))
+
+# 类/函数/变量合成一个带命名组的模式，一趟finditer完成三类结构扫描
+_RE_SIMPLE_STRUCT = re.compile(
+    r'(?P<cls>class\s+(?P<cname>\w+)(?:\s+extends\s+(?P<cext>\w+))?'
+    r'(?:\s+implements\s+(?P<cimp>[^{]+))?)'
+    r'|(?P<fn>function\s+(?P<fname>\w+)\s*\([^)]*\))'
+    r'|(?P<var>\$\w+)',
+    re.IGNORECASE)
+
+_RE_SIMPLE_VAR = re.compile(r'\$\w+')
+
 @dataclass
 class PHPMethod:
     """PHP方法信息"""
@@ -44,8 +140,15 @@ class PHPFunction:
     has_return_type: bool
 
 class PHPParser:
+    # 等待worker响应的上限（秒），与原先subprocess.run的timeout一致
+    _WORKER_TIMEOUT = 30
+
     def __init__(self):
         self.php_tokenizer_script = self._create_tokenizer_script()
+        # 常驻php worker进程，首次解析时惰性启动；锁保护其stdin/stdout管道
+        self._proc = None
+        self._proc_lock = threading.Lock()
+        self._php_unavailable = False
     
     def _create_tokenizer_script(self) -> str:
         """创建PHP tokenizer脚本"""
@@ -53,12 +156,13 @@ class PHPParser:
 // PHP代码解析脚本
 function analyze_php_code($code) {
     $tokens = token_get_all($code);
+    $n = count($tokens); // 提出循环条件：PHP不会自动外提count()调用
     $analysis = [
         'classes' => [],
         'functions' => [],
         'complexity' => 0,
         'lines' => substr_count($code, "\n") + 1,
-        'tokens_count' => count($tokens),
+        'tokens_count' => $n,
         'methods' => [],
         'variables' => [],
         'includes' => []
@@ -68,8 +172,9 @@ function analyze_php_code($code) {
     $current_function = null;
     $brace_level = 0;
     $complexity = 1; // 基础复杂度
+    $seen_vars = []; // 变量名哈希集合，O(1)去重（in_array是O(N)逐个比对）
     
-    for ($i = 0; $i < count($tokens); $i++) {
+    for ($i = 0; $i < $n; $i++) {
         $token = $tokens[$i];
         
         if (is_array($token)) {
@@ -79,7 +184,7 @@ function analyze_php_code($code) {
             switch ($token[0]) {
                 case T_CLASS:
                     // 查找类名
-                    for ($j = $i + 1; $j < count($tokens); $j++) {
+                    for ($j = $i + 1; $j < $n; $j++) {
                         if (is_array($tokens[$j]) && $tokens[$j][0] == T_STRING) {
                             $current_class = [
                                 'name' => $tokens[$j][1],
@@ -97,7 +202,7 @@ function analyze_php_code($code) {
                     
                 case T_FUNCTION:
                     // 查找函数名
-                    for ($j = $i + 1; $j < count($tokens); $j++) {
+                    for ($j = $i + 1; $j < $n; $j++) {
                         if (is_array($tokens[$j]) && $tokens[$j][0] == T_STRING) {
                             $func_info = [
                                 'name' => $tokens[$j][1],
@@ -109,7 +214,7 @@ function analyze_php_code($code) {
                             
                             // 计算参数个数
                             $param_start = false;
-                            for ($k = $j; $k < count($tokens); $k++) {
+                            for ($k = $j; $k < $n; $k++) {
                                 if ($tokens[$k] == '(') {
                                     $param_start = true;
                                 } elseif ($tokens[$k] == ')') {
@@ -141,9 +246,7 @@ function analyze_php_code($code) {
                     break;
                     
                 case T_VARIABLE:
-                    if (!in_array($token_value, $analysis['variables'])) {
-                        $analysis['variables'][] = $token_value;
-                    }
+                    $seen_vars[$token_value] = true;
                     break;
                     
                 case T_INCLUDE:
@@ -163,24 +266,27 @@ function analyze_php_code($code) {
         }
     }
     
+    // PHP数组按插入序保留键，array_keys即首次出现顺序，与逐个in_array追加一致
+    $analysis['variables'] = array_keys($seen_vars);
     $analysis['complexity'] = $complexity;
     return $analysis;
 }
 
-if ($argc != 2) {
-    echo json_encode(['error' => 'Usage: php script.php <file_path>']);
-    exit(1);
-}
-
-$file_path = $argv[1];
-if (!file_exists($file_path)) {
-    echo json_encode(['error' => 'File not found: ' . $file_path]);
-    exit(1);
+// 常驻worker：从STDIN逐行读取文件路径，逐文件输出一行紧凑JSON。
+// 一个php进程服务整个批次，解释器启动开销只付一次
+while (($line = fgets(STDIN)) !== false) {
+    $file_path = rtrim($line, "\r\n");
+    if ($file_path === '') {
+        continue;
+    }
+    if (!file_exists($file_path)) {
+        echo json_encode(['error' => 'File not found: ' . $file_path]) . "\n";
+    } else {
+        $code = file_get_contents($file_path);
+        echo json_encode(analyze_php_code($code)) . "\n";
+    }
+    fflush(STDOUT);
 }
-
-$code = file_get_contents($file_path);
-$result = analyze_php_code($code);
-echo json_encode($result, JSON_PRETTY_PRINT);
 ?>'''
         
         # 保存PHP脚本到临时文件
@@ -190,20 +296,73 @@ echo json_encode($result, JSON_PRETTY_PRINT);
     
     def parse_file(self, file_path: str) -> Dict[str, Any]:
         """解析PHP文件"""
-        try:
-            # 使用PHP脚本解析文件
-            result = subprocess.run([
-                'php', self.php_tokenizer_script, file_path
-            ], capture_output=True, text=True, timeout=30)
-            
-            if result.returncode != 0:
-                # 如果PHP不可用，使用简单的正则表达式解析
-                return self._simple_parse(file_path)
-            
-            return json.loads(result.stdout)
-        except (subprocess.TimeoutExpired, subprocess.CalledProcessError, json.JSONDecodeError, FileNotFoundError):
-            # PHP不可用时的备用解析方法
-            return self._simple_parse(file_path)
+        data = self._parse_with_worker(file_path)
+        if data is not None:
+            return data
+        # PHP不可用时的备用解析方法
+        return self._simple_parse(file_path)
+
+    def parse_files(self, file_paths: List[str]) -> List[Dict[str, Any]]:
+        """批量解析PHP文件（结果与file_paths顺序一致）
+
+        整个批次共用同一个常驻php worker，解释器启动开销只付一次；
+        PHP不可用或单个文件解析失败时，对应文件回退到正则解析。
+        """
+        return [self.parse_file(p) for p in file_paths]
+
+    def _ensure_worker(self):
+        """确保常驻php worker已启动，php不可用时返回None"""
+        if self._php_unavailable:
+            return None
+        if self._proc is None or self._proc.poll() is not None:
+            try:
+                self._proc = subprocess.Popen(
+                    ['php', self.php_tokenizer_script],
+                    stdin=subprocess.PIPE, stdout=subprocess.PIPE,
+                    stderr=subprocess.DEVNULL, text=True, bufsize=1)
+            except OSError:
+                # php不在PATH上，记住结论，后续调用不再反复尝试启动
+                self._php_unavailable = True
+                self._proc = None
+        return self._proc
+
+    def _parse_with_worker(self, file_path: str) -> Optional[Dict[str, Any]]:
+        """通过常驻worker解析单个文件
+
+        协议为一行路径换一行JSON；php不可用、worker损坏或响应超时
+        返回None，由调用方回退到正则解析。损坏的worker会被丢弃，
+        下次调用自动重启。
+        """
+        with self._proc_lock:
+            proc = self._ensure_worker()
+            if proc is None:
+                return None
+            try:
+                proc.stdin.write(file_path + '\n')
+                proc.stdin.flush()
+                ready, _, _ = select.select([proc.stdout], [], [], self._WORKER_TIMEOUT)
+                if not ready:
+                    raise TimeoutError('php worker响应超时')
+                line = proc.stdout.readline()
+                if not line:
+                    raise BrokenPipeError('php worker已退出')
+                data = _json_loads(line)
+            except Exception:
+                self._shutdown_worker()
+                return None
+        if 'error' in data:
+            return None
+        return data
+
+    def _shutdown_worker(self):
+        """终止常驻worker进程（管道损坏或对象销毁时调用）"""
+        if self._proc is not None:
+            try:
+                self._proc.kill()
+                self._proc.wait(timeout=5)
+            except Exception:
+                pass
+            self._proc = None
     
     def _simple_parse(self, file_path: str) -> Dict[str, Any]:
         """简单的PHP代码解析（当PHP不可用时使用）"""
@@ -212,50 +371,51 @@ echo json_encode($result, JSON_PRETTY_PRINT);
         
         # 基本的代码分析
         lines = content.count('\n') + 1
-        
-        # 查找类
-        class_pattern = r'class\s+(\w+)(?:\s+extends\s+(\w+))?(?:\s+implements\s+([^{]+))?'
+
+        # 类/函数/变量一趟组合扫描。函数参数表被fn分支的跨度覆盖，
+        # 其中的变量在匹配片段内补扫，结果与分开三趟完全一致
         classes = []
-        for match in re.finditer(class_pattern, content, re.IGNORECASE):
-            classes.append({
-                'name': match.group(1),
-                'extends': match.group(2),
-                'implements': match.group(3).split(',') if match.group(3) else [],
-                'methods': [],
-                'properties': 0
-            })
-        
-        # 查找函数
-        function_pattern = r'function\s+(\w+)\s*\([^)]*\)'
         functions = []
-        for match in re.finditer(function_pattern, content, re.IGNORECASE):
-            functions.append({
-                'name': match.group(1),
-                'parameters': content[match.start():match.end()].count(',') + (1 if '(' in content[match.start():match.end()] and ')' in content[match.start():match.end()] else 0),
-                'complexity': 1
-            })
-        
+        variables = set()
+        for match in _RE_SIMPLE_STRUCT.finditer(content):
+            if match.group('cls') is not None:
+                implements = match.group('cimp')
+                classes.append({
+                    'name': match.group('cname'),
+                    'extends': match.group('cext'),
+                    'implements': implements.split(',') if implements else [],
+                    'methods': [],
+                    'properties': 0
+                })
+                variables.update(_RE_SIMPLE_VAR.findall(match.group('cls')))
+            elif match.group('fn') is not None:
+                fn_text = match.group('fn')
+                functions.append({
+                    'name': match.group('fname'),
+                    'parameters': fn_text.count(',') + 1,
+                    'complexity': 1
+                })
+                variables.update(_RE_SIMPLE_VAR.findall(fn_text))
+            else:
+                variables.add(match.group('var'))
+
         # 计算复杂度
-        complexity_keywords = ['if', 'elseif', 'else', 'while', 'for', 'foreach', 'switch', 'case', 'catch']
-        complexity = 1
-        for keyword in complexity_keywords:
-            complexity += len(re.findall(r'\b' + keyword + r'\b', content, re.IGNORECASE))
-        
-        # 查找变量
-        variables = list(set(re.findall(r'\$\w+', content)))
-        
+        complexity = 1 + _count_simple_keywords(content)
+
         return {
             'classes': classes,
             'functions': functions,
             'complexity': complexity,
             'lines': lines,
             'tokens_count': len(content.split()),
-            'variables': variables,
+            'variables': list(variables),
             'includes': []
         }
     
     def __del__(self):
-        """清理临时文件"""
+        """清理worker进程和临时文件"""
+        if hasattr(self, '_proc'):
+            self._shutdown_worker()
         if hasattr(self, 'php_tokenizer_script') and os.path.exists(self.php_tokenizer_script):
             os.unlink(self.php_tokenizer_script)
 